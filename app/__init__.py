@@ -1,13 +1,43 @@
+import time
+_import_started = time.perf_counter()
+
 import os
 from flask import Flask
 from flask_login import LoginManager
 from mongoengine import connect
 from authlib.integrations.flask_client import OAuth
+from app.ml.registry import ClassifierRegistry
+from app.jobs import JobQueue
+from app.storage import ImageStore
+from app.users import UserCache
+from app.metrics import Metrics
+from app.exercises import ExerciseCatalog
+from app.passwords import PasswordHasher
 
 login_manager = LoginManager()
 oauth = OAuth()
+classifiers = ClassifierRegistry()
+jobs = JobQueue()
+uploads = ImageStore()
+users = UserCache()
+metrics = Metrics()
+catalog = ExerciseCatalog()
+passwords = PasswordHasher()
+
+# Cost of importing the app package (Flask, mongoengine, authlib, ...)
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+def connect_db(uri):
+    # mongomock:// runs against an in-memory fake (pip install mongomock)
+    if uri.startswith('mongomock://'):
+        import mongomock
+        return connect(host='mongodb://' + uri[len('mongomock://'):],
+                       mongo_client_class=mongomock.MongoClient)
+    # connect=False: the first query opens the connection, not the boot
+    return connect(host=uri, connect=False)
 
-def create_app():
+def create_app(test_config=None):
+    started = time.perf_counter()
     app = Flask(__name__)
     
     # Configuration
@@ -15,6 +45,51 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-secret-123')
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 
+    # Uploads are downscaled and re-encoded before analysis/storage
+    app.config['IMAGE_MAX_EDGE'] = int(os.environ.get('IMAGE_MAX_EDGE', 1280))
+    app.config['IMAGE_FORMAT'] = os.environ.get('IMAGE_FORMAT', 'JPEG').upper() # JPEG or WEBP
+    app.config['IMAGE_QUALITY'] = int(os.environ.get('IMAGE_QUALITY', 82))
+    app.config['THUMB_EDGE'] = int(os.environ.get('THUMB_EDGE', 160))
+    # Uploads with more pixels than this are refused before decoding
+    app.config['IMAGE_MAX_PIXELS'] = int(os.environ.get('IMAGE_MAX_PIXELS', 50_000_000))
+
+    # Gemini response cache (set AI_CACHE_STORE=mongo to persist across restarts)
+    app.config['AI_CACHE_SIZE'] = int(os.environ.get('AI_CACHE_SIZE', 1024))
+    app.config['AI_CACHE_TTL'] = int(os.environ.get('AI_CACHE_TTL', 24 * 3600))
+    app.config['AI_CACHE_STORE'] = os.environ.get('AI_CACHE_STORE')
+    # Text estimates that match calories.json at least this well never reach Gemini
+    app.config['LOCAL_MATCH_THRESHOLD'] = float(os.environ.get('LOCAL_MATCH_THRESHOLD', 0.75))
+    # GEMINI_BACKEND=fake swaps in an offline stub model (FAKE_MODEL_LATENCY seconds per call)
+    app.config['GEMINI_BACKEND'] = os.environ.get('GEMINI_BACKEND', 'gemini')
+    app.config['FAKE_MODEL_LATENCY'] = float(os.environ.get('FAKE_MODEL_LATENCY', 0))
+    app.config['FAKE_MODEL_FAILURE_RATE'] = float(os.environ.get('FAKE_MODEL_FAILURE_RATE', 0))
+
+    # Gemini calls: total deadline (s) incl. retries, retries on transient errors,
+    # in-flight cap per process; the breaker opens after N straight failures for M seconds
+    app.config['GEMINI_TIMEOUT'] = float(os.environ.get('GEMINI_TIMEOUT', 20))
+    app.config['GEMINI_RETRIES'] = int(os.environ.get('GEMINI_RETRIES', 2))
+    app.config['GEMINI_MAX_CONCURRENT'] = int(os.environ.get('GEMINI_MAX_CONCURRENT', 8))
+    app.config['BREAKER_THRESHOLD'] = int(os.environ.get('BREAKER_THRESHOLD', 5))
+    app.config['BREAKER_RESET'] = float(os.environ.get('BREAKER_RESET', 30))
+    # Request bare JSON from Gemini (response_mime_type) for structured answers
+    app.config['GEMINI_JSON_MODE'] = os.environ.get('GEMINI_JSON_MODE', '1') == '1'
+
+    # Background image analysis: worker threads and max queued jobs per process
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+    app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 32))
+    # Jobs still unfinished this long (seconds) are reported failed, e.g. after a worker restart
+    app.config['JOB_TIMEOUT'] = float(os.environ.get('JOB_TIMEOUT', 300))
+    # Per-worker cache of logged-in users (seconds; 0 disables)
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+    # Password KDF as a werkzeug method string (cost included, e.g. pbkdf2:sha256:600000),
+    # KDFs allowed at once per process, and how long a verified login skips the KDF (seconds; 0 disables)
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_MAX_CONCURRENT'] = int(os.environ.get('PASSWORD_MAX_CONCURRENT',
+                                                               os.cpu_count() or 2))
+    app.config['PASSWORD_CACHE_TTL'] = float(os.environ.get('PASSWORD_CACHE_TTL', 300))
+    # One JSON log line per request; set METRICS_TOKEN to require a bearer token on /metrics
+    app.config['METRICS_LOG'] = os.environ.get('METRICS_LOG', '1') == '1'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
     
     # MongoDB Connection
     # REQUIRED: Set MONGODB_URI env var (e.g. in Render or .env)
@@ -22,8 +97,15 @@ def create_app():
     if not mongo_uri:
         print("WARNING: MONGODB_URI not set. Using local SQLite fallback or failing.")
         mongo_uri = 'mongodb://localhost:27017/titan_local' # Safe local default
-    
-    connect(host=mongo_uri)
+    app.config['MONGODB_URI'] = mongo_uri
+
+    # Overrides for tests and benchmarks, e.g. {'MONGODB_URI': 'mongomock://localhost/bench'}
+    if test_config:
+        app.config.update(test_config)
+
+    # Instrumentation first: pymongo only monitors clients created after it
+    metrics.init_app(app)
+    connect_db(app.config['MONGODB_URI'])
 
     # Google OAuth Config
     # REQUIRED: Set GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET env vars
@@ -42,22 +124,24 @@ def create_app():
     # Initialize Plugins
     login_manager.init_app(app)
     login_manager.login_view = 'main.login'
+    classifiers.init_app(app)
+    jobs.init_app(app)
+    uploads.init_app(app)
+    users.init_app(app)
+    catalog.init_app(app)
+    passwords.init_app(app)
 
     # Register Blueprints
     from app.routes import main
+    from app.api import api
     app.register_blueprint(main)
-    
-    # Default User Initialization
-    with app.app_context():
-        from app.models import User
-        try:
-            if not User.objects(username='titan').first():
-                default_user = User(username='titan', password='123', 
-                                    height=175, weight=70, age=25, 
-                                    goal_calories=2200, goal_protein=160, goal_water=10)
-                default_user.save()
-                print("Default user 'titan' created in MongoDB.")
-        except Exception as e:
-            print(f"Database warning (safe to ignore if first run): {e}")
+    app.register_blueprint(api)
+    # API clients get a 401, not a redirect to the login page
+    login_manager.blueprint_login_views['api'] = None
+
+    # CLI: flask create-indexes, explain-queries, rebuild-rollups, gc-uploads, seed-default-user
+    from app.commands import register_commands
+    register_commands(app)
 
+    metrics.record_boot(IMPORT_SECONDS, time.perf_counter() - started)
     return app
\ No newline at end of file
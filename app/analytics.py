@@ -0,0 +1,120 @@
+"""
+Range analytics for the stats page: daily series, rolling averages,
+weekly buckets and goal streaks over any window up to a year.
+
+Input is the user's DailyRollup documents (one per logged day), read as
+raw dicts with only the needed fields and in cursor batches, then laid
+onto a dense day grid. Everything after that is vectorized NumPy, so a
+365-day report computes in well under a millisecond of array work.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.models import DailyRollup
+from app.rollups import day_of
+
+FIELDS = ('calories_in', 'calories_out', 'protein', 'carbs', 'fat', 'water',
+          'food_count', 'exercise_count')
+ROLLING_WINDOW = 7
+BATCH_SIZE = 200
+
+
+class Series:
+    """Daily values of FIELDS for `days` days from `start`; days without logs are zero."""
+
+    def __init__(self, start, days):
+        self.start = start
+        self.dates = np.arange(np.datetime64(start, 'D'), np.datetime64(start, 'D') + days)
+        self.values = np.zeros((len(FIELDS), days))
+        self.versions = {}
+
+    def __getitem__(self, field):
+        return self.values[FIELDS.index(field)]
+
+    def __len__(self):
+        return len(self.dates)
+
+
+def load(user, days, end=None):
+    """Series for the `days` days ending `end` (default today)."""
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    series = Series(start, days)
+    rows = list(DailyRollup.objects(user=user, day__gte=day_of(start), day__lte=day_of(end))
+                .only('day', 'version', *FIELDS).as_pymongo().batch_size(BATCH_SIZE))
+    if not rows:
+        return series
+    offsets = (np.array([r['day'] for r in rows], dtype='datetime64[D]') - series.dates[0]).astype(int)
+    for i, field in enumerate(FIELDS):
+        series.values[i, offsets] = [r.get(field) or 0 for r in rows]
+    series.versions = {r['day'].date(): r.get('version', 0) for r in rows}
+    return series
+
+
+def rolling_mean(values, window=ROLLING_WINDOW):
+    """Trailing mean over `window` days (fewer at the start of the range)."""
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    idx = np.arange(1, len(values) + 1)
+    lo = np.maximum(idx - window, 0)
+    return (sums[idx] - sums[lo]) / (idx - lo)
+
+
+def weekly(series, fields):
+    """Per-week (Monday-based) daily averages of `fields`: {'labels', field: [...]}."""
+    # 1970-01-01 was a Thursday: shift by 3 so weeks start on Monday
+    week = (series.dates.astype(int) + 3) // 7
+    index = week - week[0]
+    days_in_week = np.bincount(index)
+    first_day = np.datetime64('1970-01-05') + (week[0] + np.arange(len(days_in_week)) - 1) * 7
+    out = {'labels': [str(d) for d in first_day.astype('datetime64[D]')]}
+    for field in fields:
+        sums = np.bincount(index, weights=series[field])
+        out[field] = np.round(sums / days_in_week, 1).tolist()
+    return out
+
+
+def streaks(hits):
+    """{'current', 'longest'} runs of consecutive True days (current ends today or yesterday)."""
+    hits = np.asarray(hits, dtype=bool)
+    if not len(hits):
+        return {'current': 0, 'longest': 0}
+    edges = np.diff(np.concatenate(([0], hits.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    # Today still counts as in progress, so a streak through yesterday stays current
+    current = int(lengths[-1]) if len(lengths) and ends[-1] >= len(hits) - 1 else 0
+    return {'current': current, 'longest': int(lengths.max()) if len(lengths) else 0}
+
+
+def adherence(series, user):
+    """Per-day booleans for each goal the user can hit."""
+    logged = series['food_count'] > 0
+    net = series['calories_in'] - series['calories_out']
+    return {
+        'calories': logged & (net <= (user.goal_calories or 0)),
+        'protein': series['protein'] >= (user.goal_protein or 0),
+        'water': series['water'] >= (user.goal_water or 0),
+    }
+
+
+def report(user, series):
+    """Everything the stats page charts for a loaded Series, as JSON-ready lists."""
+    logged = series['food_count'] > 0
+    daily = {field: np.round(series[field], 1).tolist() for field in FIELDS}
+    rolling = {field: np.round(rolling_mean(series[field]), 1).tolist()
+               for field in ('calories_in', 'calories_out', 'protein', 'water')}
+    averages = {field: round(float(series[field][logged].mean()), 1) if logged.any() else 0
+                for field in ('calories_in', 'calories_out', 'protein', 'carbs', 'fat', 'water')}
+    return {
+        'days': len(series),
+        'labels': [str(d) for d in series.dates],
+        'daily': daily,
+        'rolling': rolling,
+        'weekly': weekly(series, ('calories_in', 'calories_out', 'protein', 'water')),
+        'averages': averages,
+        'logged_days': int(logged.sum()),
+        'streaks': {goal: streaks(hits) for goal, hits in adherence(series, user).items()},
+        'goals': {'calories': user.goal_calories, 'protein': user.goal_protein,
+                  'water': user.goal_water},
+    }
@@ -0,0 +1,220 @@
+"""
+Versioned JSON read API (/api/v1) with conditional GET.
+
+Every log write bumps `version` on the DailyRollup of the day it touches
+(see rollups._inc), so what a response depends on is known from the
+rollups alone. ETags combine those day versions with the user's goals;
+a request whose If-None-Match still matches is answered 304 before any
+log query runs or anything is rendered. The dashboard and stats pages
+are tagged the same way, so repeated refreshes cost one rollup lookup.
+
+Bulk export and import of the logs (app/transfer.py) live here as well.
+"""
+import hashlib
+import json
+from datetime import date
+
+from flask import Blueprint, Response, current_app, jsonify, request, abort, url_for, stream_with_context
+from flask_login import login_required, current_user
+
+from app import rollups, transfer
+from app.summary import daily_summary, todays_food, todays_exercise
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+MAX_STATS_DAYS = 366
+
+_template_digests = {}
+
+
+def _goals(user):
+    return {'calories': user.goal_calories, 'protein': user.goal_protein, 'water': user.goal_water}
+
+
+def _template_digest(name):
+    # Templates only change on deploy, so pages are re-tagged when they do
+    if name not in _template_digests:
+        source = current_app.jinja_env.loader.get_source(current_app.jinja_env, name)[0]
+        _template_digests[name] = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return _template_digests[name]
+
+
+def make_etag(user, kind, versions, template=None):
+    """Tag for `kind` built from `versions` (day -> rollup version) and the user's profile."""
+    raw = json.dumps([kind, str(user.id), user.username, user.weight, _goals(user),
+                      sorted((str(day), v) for day, v in versions.items()),
+                      _template_digest(template) if template else None])
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def conditional(etag, build):
+    """
+    304 when the client already holds `etag`, else the response `build()`
+    returns; either way tagged and marked for revalidation on every use.
+    """
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _day_arg():
+    value = request.args.get('day')
+    if not value:
+        return date.today()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, 'day must be YYYY-MM-DD')
+
+
+# --- Payloads (shared with the HTML pages) ---
+
+def summary_payload(user, day, rollup):
+    summary = daily_summary(user, day, rollup)
+    return dict(summary, day=day.isoformat(), goals=_goals(user))
+
+
+def logs_payload(user, day):
+    def image_url(log):
+        name = log.thumb_file or log.image_file
+        return url_for('static', filename='uploads/' + name) if name else None
+
+    return {
+        'day': day.isoformat(),
+        'food': [{'id': str(l.id), 'name': l.name, 'calories': l.calories, 'image': image_url(l)}
+                 for l in todays_food(user, day)],
+        'exercise': [{'id': str(l.id), 'activity': l.activity_name,
+                      'duration_minutes': l.duration_minutes, 'calories_burned': l.calories_burned}
+                     for l in todays_exercise(user, day)],
+    }
+
+
+def stats_series(user, days=7):
+    """(days, {date: DailyRollup}) for the last `days` days."""
+    dates = rollups.recent_days(days)
+    return dates, rollups.rollups_between(user, dates[0], dates[-1])
+
+
+def stats_payload(dates, by_day):
+    def series(field):
+        return [getattr(by_day[d], field) if d in by_day else 0 for d in dates]
+
+    return {
+        'labels': [d.isoformat() for d in dates],
+        'calories_in': series('calories_in'),
+        'calories_out': series('calories_out'),
+        'protein': series('protein'),
+        'water': series('water'),
+    }
+
+
+def versions_of(by_day):
+    return {day: r.version for day, r in by_day.items()}
+
+
+def stream_json(payload):
+    """A JSON object sent one top-level key at a time, so large series start arriving early."""
+    yield '{'
+    for i, (key, value) in enumerate(payload.items()):
+        yield (',' if i else '') + json.dumps(key) + ':' + json.dumps(value)
+    yield '}'
+
+
+# --- Endpoints ---
+
+@api.errorhandler(400)
+@api.errorhandler(401)
+def json_error(e):
+    return jsonify({'error': e.description}), e.code
+
+
+@api.route('/summary')
+@login_required
+def summary():
+    day = _day_arg()
+    rollup = rollups.rollup_for(current_user, day)
+    etag = make_etag(current_user, 'summary', {day: rollup.version})
+    return conditional(etag, lambda: jsonify(dict(
+        summary_payload(current_user, day, rollup), version=etag)))
+
+
+@api.route('/logs')
+@login_required
+def logs():
+    day = _day_arg()
+    rollup = rollups.rollup_for(current_user, day)
+    etag = make_etag(current_user, 'logs', {day: rollup.version})
+    return conditional(etag, lambda: jsonify(dict(logs_payload(current_user, day), version=etag)))
+
+
+@api.route('/stats')
+@login_required
+def stats():
+    days = request.args.get('days', 7, type=int)
+    if not 1 <= days <= MAX_STATS_DAYS:
+        abort(400, f'days must be between 1 and {MAX_STATS_DAYS}')
+    dates, by_day = stats_series(current_user, days)
+    # The window moves daily, so the tag names its last day too
+    etag = make_etag(current_user, f'stats:{days}:{dates[-1]}', versions_of(by_day))
+    return conditional(etag, lambda: jsonify(dict(stats_payload(dates, by_day), version=etag)))
+
+
+@api.route('/analytics')
+@login_required
+def analytics_report():
+    """Series, rolling averages, weekly buckets and streaks for ?days= (see app/analytics.py)."""
+    # Imported here to keep NumPy out of worker boot
+    from app import analytics
+    days = request.args.get('days', 30, type=int)
+    if not 1 <= days <= MAX_STATS_DAYS:
+        abort(400, f'days must be between 1 and {MAX_STATS_DAYS}')
+    series = analytics.load(current_user, days)
+    etag = make_etag(current_user, f'analytics:{days}:{series.dates[-1]}', series.versions)
+    return conditional(etag, lambda: Response(
+        stream_json(dict(analytics.report(current_user, series), version=etag)),
+        mimetype='application/json'))
+
+
+# --- Export / import ---
+
+@api.route('/export')
+@login_required
+def export_logs():
+    """The user's logs as a gzipped NDJSON (default) or CSV download, streamed from the cursors."""
+    fmt = request.args.get('format', 'ndjson')
+    kinds = request.args.get('types', ','.join(transfer.KINDS)).split(',')
+    if fmt not in transfer.FORMATS or not set(kinds) <= set(transfer.KINDS):
+        abort(400, f"format is one of {', '.join(transfer.FORMATS)}; "
+                   f"types a comma list of {', '.join(transfer.KINDS)}")
+    user = current_user._get_current_object()
+    filename = f"titan-{user.username}-{date.today().isoformat()}.{fmt}.gz"
+    chunks = transfer.gzip_chunks(transfer.encode(transfer.iter_rows(user, kinds), fmt))
+    return Response(stream_with_context(chunks), mimetype='application/gzip',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@api.route('/import', methods=['POST'])
+@login_required
+def import_logs():
+    """
+    Imports an uploaded export ("file", gzipped or not). Rows already
+    present are skipped, so a failed upload can simply be retried; send
+    new_ids=1 to import a copy of rows that exist under other ids.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        abort(400, 'Expected a "file" upload.')
+    fmt = request.form.get('format') or transfer.format_for(upload.filename)
+    if fmt not in transfer.FORMATS:
+        abort(400, f"format is one of {', '.join(transfer.FORMATS)}")
+    try:
+        rows = transfer.read_rows(transfer.open_text(upload.stream), fmt)
+        result = transfer.import_rows(current_user, rows,
+                                      keep_ids=request.form.get('new_ids') != '1')
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        abort(400, f'Could not read the file: {e}')
+    return jsonify(result)
@@ -0,0 +1,135 @@
+import click
+
+from app.models import User
+
+
+def register_commands(app):
+    app.cli.add_command(create_indexes_command)
+    app.cli.add_command(explain_queries_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(gc_uploads_command)
+    app.cli.add_command(seed_default_user_command)
+    app.cli.add_command(export_logs_command)
+    app.cli.add_command(import_logs_command)
+
+
+def _user_named(username):
+    user = User.objects(username=username).first()
+    if not user:
+        raise click.ClickException(f"No user named '{username}'")
+    return user
+
+
+@click.command('create-indexes')
+def create_indexes_command():
+    """Build the declared MongoDB indexes in the background."""
+    from app.indexes import create_indexes
+    for name, indexes in create_indexes():
+        click.echo(f"{name}: {', '.join(indexes)}")
+
+
+@click.command('explain-queries')
+@click.option('--username', default='titan', help='User whose queries are explained.')
+def explain_queries_command(username):
+    """Print the query plan of every route query; exits 1 on a collection scan."""
+    from app.indexes import explain_report
+    user = _user_named(username)
+
+    scans = 0
+    for row in explain_report(user):
+        plan = ' > '.join(row['stages'])
+        index = row['index'] or '-'
+        flag = 'COLLSCAN' if row['collscan'] else 'ok'
+        click.echo(f"{flag:8} {row['route']:14} {row['query']:20} {index:28} {plan}")
+        scans += row['collscan']
+    if scans:
+        raise SystemExit(1)
+
+
+@click.command('rebuild-rollups')
+@click.option('--username', default=None, help='Only rebuild this user (default: everyone).')
+@click.option('--batch-size', default=1000, show_default=True, help='Groups per bulk write.')
+def rebuild_rollups_command(username, batch_size):
+    """Recompute DailyRollup documents from the raw food, water and exercise logs."""
+    from app.rollups import rebuild
+    user = _user_named(username) if username else None
+    applied = rebuild(user, batch_size=batch_size)
+    click.echo(f"Rebuilt {applied} daily rollup groups.")
+
+
+@click.command('gc-uploads')
+@click.option('--grace-hours', default=24, show_default=True,
+              help='Keep unreferenced files younger than this.')
+@click.option('--dry-run', is_flag=True, help='Only list what would be removed.')
+def gc_uploads_command(grace_hours, dry_run):
+    """Delete uploaded images that no food log references any more."""
+    from app import uploads
+    removed = uploads.gc(grace_seconds=grace_hours * 3600, dry_run=dry_run)
+    for name in removed:
+        click.echo(name)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} file(s).")
+
+
+@click.command('seed-default-user')
+def seed_default_user_command():
+    """Create the demo 'titan' account if it does not exist yet."""
+    if User.objects(username='titan').first():
+        click.echo("Default user 'titan' already exists.")
+        return
+    from app import passwords
+    User(username='titan', password=passwords.hash('123'),
+         height=175, weight=70, age=25,
+         goal_calories=2200, goal_protein=160, goal_water=10).save()
+    click.echo("Default user 'titan' created in MongoDB.")
+
+
+@click.command('export-logs')
+@click.option('--username', required=True, help='User whose logs are exported.')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default=None,
+              help='Default: from the file name, else ndjson.')
+@click.option('--types', default='food,water,exercise', show_default=True)
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per cursor batch.')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+def export_logs_command(username, fmt, types, batch_size, path):
+    """Write a user's food, water and exercise logs to PATH (gzipped if it ends in .gz; - for stdout)."""
+    from app import transfer
+    user = _user_named(username)
+    fmt = fmt or transfer.format_for(path)
+    kinds = [k for k in types.split(',') if k]
+    if not set(kinds) <= set(transfer.KINDS):
+        raise click.BadParameter(f"choose from {', '.join(transfer.KINDS)}", param_hint='--types')
+
+    rows = 0
+
+    def counted(it):
+        nonlocal rows
+        for row in it:
+            rows += 1
+            yield row
+    chunks = transfer.encode(counted(transfer.iter_rows(user, kinds, batch_size)), fmt)
+    with click.open_file(path, 'wb') as out:
+        for data in (transfer.gzip_chunks(chunks) if path.endswith('.gz') else
+                     (chunk.encode() for chunk in chunks)):
+            out.write(data)
+    click.echo(f"Exported {rows} rows.", err=path == '-')
+
+
+@click.command('import-logs')
+@click.option('--username', required=True, help='User the logs are imported into.')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default=None,
+              help='Default: from the file name, else ndjson.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per insert_many.')
+@click.option('--new-ids', is_flag=True,
+              help="Ignore the file's ids, e.g. to copy another user's export in this database.")
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_logs_command(username, fmt, chunk_size, new_ids, path):
+    """Import an export-logs file (NDJSON or CSV, gzipped or not) and update the day rollups."""
+    from app import transfer
+    user = _user_named(username)
+    with open(path, 'rb') as f:
+        rows = transfer.read_rows(transfer.open_text(f), fmt or transfer.format_for(path))
+        result = transfer.import_rows(user, rows, chunk_size=chunk_size, keep_ids=not new_ids)
+    for error in result['errors']:
+        click.echo(error, err=True)
+    click.echo(f"Inserted {result['inserted']}, skipped {result['duplicates']} already present, "
+               f"rejected {result['rejected']} invalid row(s).")
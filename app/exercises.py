@@ -0,0 +1,144 @@
+"""
+Exercise catalog and MET-based calorie burn.
+
+data/gym_exercises.json is read once (and again only when its mtime
+changes) into an ordered name -> {met, icon} mapping plus a NumPy array
+of METs. Burns are always computed server-side from MET, body weight and
+duration, so they can be recomputed in bulk when the weight changes.
+
+NumPy is imported on first use, keeping it out of worker boot.
+"""
+import json
+import math
+import os
+import threading
+
+from app.models import ExerciseLog
+from app import rollups
+
+# Cardio modes of the workout page (Compendium of Physical Activities)
+CARDIO_METS = {'walk': 3.5, 'run': 8.0}
+# Range of the intensity slider on the workout page
+MIN_MET, MAX_MET = 1.0, 15.0
+DEFAULT_MET = 5.0
+DEFAULT_WEIGHT = 70.0
+MAX_MINUTES = 24 * 60
+
+
+def burn(mets, minutes, weight):
+    """
+    kcal burned: MET x 3.5 x kg / 200 per minute (the ACSM formula the
+    workout page shows live). Works element-wise on arrays. A missing or
+    non-finite weight counts as DEFAULT_WEIGHT.
+    """
+    import numpy as np
+    weight = float(weight or DEFAULT_WEIGHT)
+    if not math.isfinite(weight) or weight <= 0:
+        weight = DEFAULT_WEIGHT
+    kcal = np.asarray(mets, dtype=float) * (3.5 * weight / 200) * np.asarray(minutes, dtype=float)
+    return np.rint(kcal).astype(int)
+
+
+class ExerciseCatalog:
+    def __init__(self, app=None):
+        self.data_path = os.path.normpath(os.path.join(
+            os.path.dirname(__file__), '..', 'data', 'gym_exercises.json'))
+        self._entries = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.data_path = os.path.normpath(os.path.join(app.root_path, '..', 'data', 'gym_exercises.json'))
+        self._entries = None
+        app.extensions['exercise_catalog'] = self
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.data_path)
+        except OSError:
+            mtime = None
+        if self._entries is not None and mtime == self._mtime:
+            return
+        import numpy as np
+        with self._lock:
+            if self._entries is not None and mtime == self._mtime:
+                return
+            try:
+                with open(self.data_path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Exercise catalog unavailable: {e}")
+                data = {}
+            entries = {name: {'met': float(d.get('met', DEFAULT_MET)), 'icon': d.get('icon', '')}
+                       for name, d in data.items()}
+            self.names = list(entries)
+            self.mets = np.array([e['met'] for e in entries.values()], dtype=float)
+            self._lower = {name.lower(): i for i, name in enumerate(self.names)}
+            self._entries = entries
+            self._mtime = mtime
+
+    @property
+    def entries(self):
+        """Ordered {name: {'met', 'icon'}} for rendering the gym grid."""
+        self._load()
+        return self._entries
+
+    def met_for(self, activity, claimed=None):
+        """
+        MET for a logged activity: the intensity the client chose (clamped
+        to the slider's range), else the catalog entry for the exercise or
+        cardio mode named in `activity`, else DEFAULT_MET. A non-finite
+        claim counts as no claim.
+        """
+        try:
+            claimed = float(claimed)
+            if math.isfinite(claimed):
+                return min(max(claimed, MIN_MET), MAX_MET)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        self._load()
+        name = (activity or '').split(' (')[0].strip().lower()
+        if name in self._lower:
+            return float(self.mets[self._lower[name]])
+        for mode, met in CARDIO_METS.items():
+            if mode in name:
+                return met
+        return DEFAULT_MET
+
+    def recompute_burns(self, user, weight):
+        """
+        Recomputes calories_burned of every ExerciseLog that recorded its MET
+        for a new body weight, and moves each day's rollup by the difference.
+        Logs sharing a (MET, duration) get the same burn, so each distinct pair
+        is one update_many. Returns the number of logs changed.
+        """
+        logs = list(ExerciseLog.objects(user=user, met__ne=None)
+                    .only('met', 'duration_minutes', 'calories_burned', 'date_posted')
+                    .as_pymongo())
+        if not logs:
+            return 0
+        import numpy as np
+        mets = np.array([log['met'] for log in logs], dtype=float)
+        minutes = np.array([log.get('duration_minutes') or 0 for log in logs], dtype=float)
+        old = np.array([log.get('calories_burned') or 0 for log in logs], dtype=int)
+        new = burn(mets, minutes, weight)
+        changed = new != old
+        if not changed.any():
+            return 0
+
+        updates = {(float(m), int(d)): int(n) for m, d, n in zip(mets[changed], minutes[changed], new[changed])}
+        for (met, duration), calories in updates.items():
+            ExerciseLog.objects(user=user, met=met, duration_minutes=duration).update(
+                set__calories_burned=calories)
+
+        days = [rollups.day_of(log['date_posted']) for log in logs]
+        unique_days = sorted(set(days))
+        index = np.searchsorted(np.array(unique_days, dtype='datetime64[us]'),
+                                np.array(days, dtype='datetime64[us]'))
+        deltas = np.bincount(index, weights=new - old, minlength=len(unique_days))
+        for day, delta in zip(unique_days, deltas):
+            if delta:
+                rollups.exercise_changed(user, day, int(delta), count=0)
+        return int(changed.sum())
@@ -0,0 +1,74 @@
+import io
+from collections import namedtuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Pillow format -> (MIME type, file extension)
+FORMATS = {
+    'JPEG': ('image/jpeg', '.jpg'),
+    'WEBP': ('image/webp', '.webp'),
+}
+
+EncodedImage = namedtuple('EncodedImage', 'data thumb_data mime_type ext')
+# Largest upload decoded (50 MP covers phone cameras; a bomb can be 25 KB on the wire)
+MAX_PIXELS = 50_000_000
+
+
+def _encode(img, fmt, quality):
+    if fmt == 'JPEG' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    out = io.BytesIO()
+    img.save(out, fmt, quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def _open(stream, max_pixels):
+    """Image.open() that refuses images over `max_pixels` before anything is decoded."""
+    try:
+        img = Image.open(stream)
+    except Image.DecompressionBombError as e:
+        raise UnidentifiedImageError(str(e)) from e
+    width, height = img.size
+    if width * height > max_pixels:
+        raise UnidentifiedImageError(f'{width}x{height} image exceeds {max_pixels} pixels')
+    return img
+
+
+def preprocess_upload(stream, max_edge=1280, fmt='JPEG', quality=82, thumb_edge=160,
+                      max_pixels=MAX_PIXELS):
+    """
+    Decodes an uploaded image straight from its stream, applies the EXIF
+    orientation, shrinks it to fit `max_edge` and re-encodes it as `fmt`,
+    plus a `thumb_edge` thumbnail for the food log. Returns the encoded
+    bytes; the raw upload is never written to disk.
+
+    Raises PIL.UnidentifiedImageError if the stream isn't an image or has
+    more than `max_pixels` pixels.
+    """
+    fmt = fmt.upper()
+    mime_type, ext = FORMATS[fmt]
+    img = _open(stream, max_pixels)
+    # Let the JPEG decoder scale down while decoding (much cheaper than a full decode)
+    img.draft('RGB', (max_edge, max_edge))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    data = _encode(img, fmt, quality)
+
+    thumb = img.copy()
+    thumb.thumbnail((thumb_edge, thumb_edge), Image.LANCZOS)
+    thumb_data = _encode(thumb, fmt, quality)
+
+    return EncodedImage(data, thumb_data, mime_type, ext)
+
+
+def preprocess_from_config(file, config):
+    """preprocess_upload() for a werkzeug FileStorage using the app's IMAGE_* settings."""
+    return preprocess_upload(
+        file.stream,
+        max_edge=config['IMAGE_MAX_EDGE'],
+        fmt=config['IMAGE_FORMAT'],
+        quality=config['IMAGE_QUALITY'],
+        thumb_edge=config['THUMB_EDGE'],
+        max_pixels=config['IMAGE_MAX_PIXELS'])
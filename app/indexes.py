@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+from app.models import (User, FoodLog, WaterLog, ExerciseLog, CachedResponse, DailyRollup,
+                        AnalysisJob, PendingAnalysis)
+from app.rollups import day_of
+from app.summary import day_bounds
+
+INDEXED_DOCUMENTS = [User, FoodLog, WaterLog, ExerciseLog, CachedResponse, DailyRollup, AnalysisJob,
+                     PendingAnalysis]
+
+
+def create_indexes():
+    """Builds every declared index (in the background where the server supports it)."""
+    created = []
+    for document in INDEXED_DOCUMENTS:
+        document.ensure_indexes()
+        created.append((document.__name__, sorted(document._get_collection().index_information())))
+    return created
+
+
+def route_queries(user):
+    """The filters each route sends to MongoDB, as (route, label, queryset)."""
+    start, end = day_bounds()
+    week_start = day_of(date.today() - timedelta(days=6))
+    today = dict(user=user, date_posted__gte=start, date_posted__lte=end)
+    return [
+        ('dashboard', 'rollup today', DailyRollup.objects(user=user, day=day_of())),
+        ('dashboard', 'food today', FoodLog.objects(**today)),
+        ('dashboard', 'exercise today', ExerciseLog.objects(**today)),
+        ('remove_water', 'latest glass today', WaterLog.objects(**today).order_by('-date_posted')),
+        ('stats', 'rollups last 7 days', DailyRollup.objects(user=user, day__gte=week_start)),
+    ]
+
+
+def _plan_stages(plan):
+    # Newer servers nest the tree under 'queryPlan'
+    plan = plan.get('queryPlan', plan)
+    stages = [plan.get('stage')]
+    children = list(plan.get('inputStages', []))
+    if 'inputStage' in plan:
+        children.append(plan['inputStage'])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _plan_index(plan):
+    plan = plan.get('queryPlan', plan)
+    if plan.get('indexName'):
+        return plan['indexName']
+    for child in list(plan.get('inputStages', [])) + [plan.get('inputStage', {})]:
+        if child and _plan_index(child):
+            return _plan_index(child)
+    return None
+
+
+def explain_report(user):
+    """
+    explain() of every route query. Each row says whether the winning plan
+    uses an index or falls back to a collection scan.
+    """
+    report = []
+    for route, label, queryset in route_queries(user):
+        plan = queryset.explain().get('queryPlanner', {}).get('winningPlan', {})
+        stages = [s for s in _plan_stages(plan) if s]
+        report.append({
+            'route': route,
+            'query': label,
+            'stages': stages,
+            'index': _plan_index(plan),
+            'collscan': 'COLLSCAN' in stages,
+        })
+    return report
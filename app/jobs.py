@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.models import AnalysisJob
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when every slot is taken."""
+
+
+class JobQueue:
+    """
+    Bounded background pool for slow model calls (image analysis).
+
+    `submit` records an AnalysisJob and returns its id straight away; a
+    worker thread runs the call and stores the result on the job, so any
+    worker process can answer `/jobs/<id>`. At most `max_pending` jobs
+    (running + waiting) are accepted per process; beyond that `submit`
+    raises QueueFull instead of letting requests pile up.
+
+    Jobs live in this process's pool, so a worker restart loses whatever
+    was queued or running. `get` reports a job still unfinished
+    `timeout` seconds after it was created (or started) as failed, so
+    pollers stop waiting and the user can retry.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 4
+        self.max_pending = 32
+        self.timeout = 300
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get('JOB_WORKERS', self.workers)
+        self.max_pending = app.config.get('JOB_QUEUE_SIZE', self.max_pending)
+        self.timeout = app.config.get('JOB_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['jobs'] = self
+
+    @property
+    def executor(self):
+        # Created on first use so it is never inherited across a fork
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='analysis')
+        return self._executor
+
+    def submit(self, user, kind, fn, *args, image_file=None, thumb_file=None):
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull()
+        try:
+            job = AnalysisJob(user=user, kind=kind, image_file=image_file, thumb_file=thumb_file)
+            job.save()
+            self.executor.submit(self._run, job.id, fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+        return str(job.id)
+
+    def _run(self, job_id, fn, args):
+        try:
+            AnalysisJob.objects(pk=job_id).update_one(set__status='running',
+                                                      set__started=datetime.utcnow())
+            result = fn(*args)
+            AnalysisJob.objects(pk=job_id).update_one(
+                set__status='done', set__result=result, set__finished=datetime.utcnow())
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            AnalysisJob.objects(pk=job_id).update_one(
+                set__status='failed', set__error=str(e), set__finished=datetime.utcnow())
+        finally:
+            self._slots.release()
+
+    def get(self, job_id, user):
+        """The user's job, or None (unknown id, someone else's job or expired)."""
+        try:
+            job = AnalysisJob.objects(pk=job_id, user=user).first()
+        except Exception:
+            return None
+        if job is not None and job.status in ('queued', 'running'):
+            self._fail_if_stale(job)
+        return job
+
+    def _fail_if_stale(self, job):
+        now = datetime.utcnow()
+        if now - (job.started or job.created) < timedelta(seconds=self.timeout):
+            return
+        error = 'Analysis was interrupted, please try again.'
+        # Conditional on the status read, so a job finishing meanwhile keeps its result
+        if AnalysisJob.objects(pk=job.pk, status=job.status).update_one(
+                set__status='failed', set__error=error, set__finished=now):
+            job.status, job.error, job.finished = 'failed', error, now
+        else:
+            job.reload()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
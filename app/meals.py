@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from app.models import FoodLog
+from app import rollups
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def food_log_from_result(user, result, when, image_file=None, thumb_file=None):
+    """FoodLog for one estimate, either model-shaped ({'dish', 'nutrition'}) or chat-shaped ({'food_name', 'calories'})."""
+    nut = result.get('nutrition') if isinstance(result.get('nutrition'), dict) else result
+    return FoodLog(
+        user=user,
+        name=str(result.get('dish') or result.get('food_name') or 'Quick Add')[:100],
+        calories=int(_number(nut.get('calories'))),
+        protein=_number(nut.get('protein')),
+        carbs=_number(nut.get('carbs')),
+        fat=_number(nut.get('fat')),
+        image_file=image_file,
+        thumb_file=thumb_file,
+        date_posted=when,
+    )
+
+
+def log_meal(user, results, image_file=None, thumb_file=None):
+    """
+    Writes one FoodLog per result with a single bulk insert and a single
+    rollup update. Results that are None (not estimated) are skipped.
+    Returns the inserted logs.
+    """
+    when = datetime.now()
+    logs = [food_log_from_result(user, r, when, image_file, thumb_file) for r in results if r]
+    if not logs:
+        return []
+    for log in logs:
+        log.validate()
+    FoodLog.objects.insert(logs, load_bulk=False)
+    rollups.food_changed(
+        user, when,
+        calories=sum(log.calories for log in logs),
+        protein=sum(log.protein for log in logs),
+        carbs=sum(log.carbs for log in logs),
+        fat=sum(log.fat for log in logs),
+        count=len(logs))
+    return logs
@@ -0,0 +1,214 @@
+"""
+Request, MongoDB and model-call instrumentation.
+
+Every request is timed and its MongoDB commands (through pymongo command
+monitoring) and Gemini calls are counted and timed against it via a
+context variable, so work done by background job threads is still
+counted globally but never attributed to a request. Totals are kept as
+Prometheus histograms in this process and served at `/metrics`; each
+request also prints one JSON log line with its own breakdown.
+
+Metrics are per worker process: with several gunicorn workers each
+scrape sees the worker that answered it.
+"""
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+# Seconds; covers fast indexed lookups up to slow model calls
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = ContextVar('titan_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('db_count', 'db_seconds', 'model_count', 'model_seconds')
+
+    def __init__(self):
+        self.db_count = 0
+        self.db_seconds = 0.0
+        self.model_count = 0
+        self.model_seconds = 0.0
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labels, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for label_values, (counts, total, seconds) in sorted(series.items()):
+            labels = ','.join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            sep = ',' if labels else ''
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {total}')
+            braced = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_count{braced} {total}')
+            lines.append(f'{self.name}_sum{braced} {seconds:.6f}')
+        return lines
+
+
+def _gauges(name, help_text, values, label=None):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in values.items():
+        labels = f'{{{label}="{key}"}}' if label else ''
+        lines.append(f"{name}{labels} {value}")
+    return lines
+
+
+class Metrics:
+    """
+    Instrumentation extension. Call `init_app` before the MongoDB client is
+    created: pymongo only attaches command listeners to new clients.
+    """
+
+    def __init__(self, app=None):
+        self.log_requests = True
+        self.token = None
+        self.requests = Histogram('titan_http_request_duration_seconds',
+                                  'Request latency by route.', ('route', 'method', 'status'))
+        self.db = Histogram('titan_mongo_command_duration_seconds',
+                            'MongoDB command latency.', ('command', 'outcome'))
+        self.model = Histogram('titan_model_call_duration_seconds',
+                               'Gemini call latency.', ('kind', 'outcome'))
+        self.boot = {}
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.log_requests = app.config.get('METRICS_LOG', self.log_requests)
+        self.token = app.config.get('METRICS_TOKEN', self.token)
+        self._listen()
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+        app.extensions['metrics'] = self
+
+    def _listen(self):
+        if self._listening:
+            return
+        monitoring.register(_CommandListener(self))
+        self._listening = True
+
+    # --- Request hooks ---
+    def _before(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = _current.set(RequestStats())
+
+    def _after(self, response):
+        start = g.get('metrics_start')
+        stats = _current.get()
+        if start is None or stats is None:
+            return response
+        seconds = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.requests.observe(seconds, route, request.method, str(response.status_code))
+        if self.log_requests and route != '/metrics':
+            print(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'route': route,
+                'status': response.status_code,
+                'ms': round(seconds * 1000, 2),
+                'db_queries': stats.db_count,
+                'db_ms': round(stats.db_seconds * 1000, 2),
+                'model_calls': stats.model_count,
+                'model_ms': round(stats.model_seconds * 1000, 2),
+            }), flush=True)
+        return response
+
+    def _teardown(self, exc):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    # --- Observers ---
+    def observe_db(self, command, seconds, ok):
+        self.db.observe(seconds, command, 'ok' if ok else 'error')
+        stats = _current.get()
+        if stats is not None:
+            stats.db_count += 1
+            stats.db_seconds += seconds
+
+    def observe_model_call(self, kind, seconds, ok):
+        self.model.observe(seconds, kind, 'ok' if ok else 'error')
+        stats = _current.get()
+        if stats is not None:
+            stats.model_count += 1
+            stats.model_seconds += seconds
+
+    def record_boot(self, import_seconds, create_app_seconds):
+        """Startup cost of this worker: package import and create_app()."""
+        self.boot = {'import': round(import_seconds, 4), 'create_app': round(create_app_seconds, 4)}
+        print(json.dumps({'event': 'boot', 'pid': os.getpid(),
+                          **{f'{phase}_ms': round(s * 1000, 1) for phase, s in self.boot.items()}}),
+              flush=True)
+
+    # --- /metrics ---
+    def render(self):
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            return Response('Unauthorized\n', 401, mimetype='text/plain')
+        from app import classifiers, users, passwords
+        lines = self.requests.render() + self.db.render() + self.model.render()
+        lines += _gauges('titan_ai_cache', 'Gemini response cache counters.',
+                         classifiers.cache.stats(), label='stat')
+        lines += _gauges('titan_user_cache', 'Logged-in user cache counters.',
+                         users.cache.stats(), label='stat')
+        lines += _gauges('titan_login_cache', 'Verified-login cache counters.',
+                         passwords.cache.stats(), label='stat')
+        lines += _gauges('titan_boot_seconds', 'Worker startup time by phase.', self.boot,
+                         label='phase')
+        breaker = classifiers.guard.breaker
+        lines += _gauges('titan_model_breaker_open', 'Whether the Gemini circuit breaker is open.',
+                         {'': int(breaker.state == 'open')})
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+class _CommandListener(monitoring.CommandListener):
+    """Feeds every finished MongoDB command to Metrics.observe_db."""
+
+    IGNORED = frozenset(('hello', 'ismaster', 'isMaster', 'ping', 'endSessions', 'saslStart',
+                         'saslContinue'))
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name not in self.IGNORED:
+            self.metrics.observe_db(event.command_name, event.duration_micros / 1e6, True)
+
+    def failed(self, event):
+        if event.command_name not in self.IGNORED:
+            self.metrics.observe_db(event.command_name, event.duration_micros / 1e6, False)
@@ -0,0 +1,131 @@
+import copy
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+def normalize_text(text):
+    """Lower-cases and collapses whitespace so trivially different inputs share a key."""
+    text = re.sub(r'\s+', ' ', (text or '').strip().lower())
+    return text.rstrip('.!?')
+
+
+def make_key(kind, payload, version):
+    """
+    Content-addressed cache key: sha256 over the kind, prompt version and
+    the payload (raw image bytes or normalized text).
+    """
+    if isinstance(payload, str):
+        payload = normalize_text(payload).encode('utf-8')
+    h = hashlib.sha256()
+    h.update(f"{kind}:{version}:".encode('utf-8'))
+    h.update(payload)
+    return h.hexdigest()
+
+
+class MongoCacheStore:
+    """
+    Persistent second tier backed by the `cached_response` collection.
+    Entries expire through a TTL index, so they survive restarts and are
+    shared by every worker.
+    """
+
+    def get(self, key):
+        from app.models import CachedResponse
+        doc = CachedResponse.objects(key=key).only('value', 'expires_at').first()
+        if doc is None or doc.expires_at < datetime.utcnow():
+            return None
+        return doc.value
+
+    def set(self, key, value, ttl):
+        from app.models import CachedResponse
+        CachedResponse.objects(key=key).update_one(
+            upsert=True,
+            set__value=value,
+            set__expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+
+
+class ResponseCache:
+    """
+    In-memory LRU with per-entry TTL in front of an optional persistent store.
+    """
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self.store is not None:
+            try:
+                value = self.store.get(key)
+            except Exception as e:
+                print(f"Cache store read failed: {e}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.store_hits += 1
+                self._remember(key, value, now)
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if value is None:
+            return
+        value = copy.deepcopy(value)
+        self._remember(key, value, time.monotonic())
+        if self.store is not None:
+            try:
+                self.store.set(key, value, self.ttl)
+            except Exception as e:
+                print(f"Cache store write failed: {e}")
+
+    def _remember(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        # In-memory entry only; the persistent store keeps its own TTL
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
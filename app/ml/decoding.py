@@ -0,0 +1,227 @@
+import json
+import re
+
+# Passed as generation_config when the SDK's JSON response mode is on, so
+# Gemini returns bare JSON instead of prose or markdown around it.
+JSON_RESPONSE_CONFIG = {'response_mime_type': 'application/json'}
+
+CHAT_ACTIONS = ('none', 'log_food', 'update_goal')
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_OPENERS = {'{': '}', '[': ']'}
+
+
+class DecodeError(ValueError):
+    """The model response holds no JSON, or none that fits the expected shape."""
+
+
+def _balanced_spans(text):
+    """
+    Yields (start, end) of every top-level balanced {...} / [...] span,
+    skipping brackets inside JSON strings.
+    """
+    i, n = 0, len(text)
+    while i < n:
+        opener = text[i]
+        if opener not in _OPENERS:
+            i += 1
+            continue
+        stack, in_string, escaped = [_OPENERS[opener]], False, False
+        j = i + 1
+        while j < n and stack:
+            ch = text[j]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in _OPENERS:
+                stack.append(_OPENERS[ch])
+            elif ch in '}]':
+                if ch != stack[-1]:
+                    break
+                stack.pop()
+            j += 1
+        if not stack:
+            yield i, j
+            i = j
+        else:
+            # Unbalanced from here; an inner opener may still start a valid span
+            i += 1
+
+
+def extract_json(text):
+    """
+    Returns the first JSON value in a model response, ignoring markdown
+    fences, preamble and trailing commentary. A bare `null` decodes to None.
+
+    Raises DecodeError when no JSON object or array can be found.
+    """
+    if text is None:
+        raise DecodeError("Empty model response")
+    stripped = text.strip()
+    # Fast path: the whole response is JSON (always the case in JSON mode)
+    if stripped[:1] in _OPENERS or stripped == 'null':
+        try:
+            return json.loads(stripped)
+        except ValueError:
+            pass
+    for start, end in _balanced_spans(stripped):
+        try:
+            return json.loads(stripped[start:end])
+        except ValueError:
+            continue
+    if re.search(r'\bnull\b', stripped) and not re.search(r'[{\[]', stripped):
+        return None
+    raise DecodeError(f"No JSON found in model response: {stripped[:80]!r}")
+
+
+def number(value, default=0.0):
+    """Reads a float from a JSON number or text like "280 kcal" / "~12g"."""
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value.replace(',', ''))
+        if match:
+            return float(match.group())
+    return default
+
+
+def _text(value, default=''):
+    if value is None:
+        return default
+    return str(value).strip() or default
+
+
+def coerce_food(obj):
+    """
+    Normalises a single-dish estimate to
+    {"dish", "nutrition": {calories:int, protein, carbs, fat: float, unit}, "vitamins", ...}.
+    """
+    if not isinstance(obj, dict):
+        raise DecodeError("Food estimate is not an object")
+    dish = _text(obj.get('dish') or obj.get('food_name') or obj.get('name'))
+    if not dish:
+        raise DecodeError("Food estimate has no dish name")
+    nut = obj.get('nutrition')
+    if not isinstance(nut, dict):
+        # Flat answers ({"dish", "calories", ...}) carry the numbers at the top level
+        nut = obj
+    result = dict(obj)
+    result['dish'] = dish
+    result['nutrition'] = {
+        'calories': int(round(number(nut.get('calories')))),
+        'protein': round(number(nut.get('protein')), 1),
+        'carbs': round(number(nut.get('carbs')), 1),
+        'fat': round(number(nut.get('fat')), 1),
+        'unit': _text(nut.get('unit'), '1 serving'),
+    }
+    vitamins = obj.get('vitamins') or []
+    if isinstance(vitamins, str):
+        vitamins = vitamins.split(',')
+    result['vitamins'] = [_text(v) for v in vitamins if _text(v)]
+    if 'advice' in obj:
+        result['advice'] = _text(obj['advice'])
+    return result
+
+
+def coerce_meal(obj):
+    """
+    coerce_food() for each entry of {"items": [...]} or a bare list. Entries
+    that are not a usable dish become None, so positions still line up with
+    the items that were asked about.
+    """
+    items = obj.get('items') if isinstance(obj, dict) else obj
+    if not isinstance(items, list):
+        raise DecodeError("Meal estimate has no item list")
+    dishes = []
+    for item in items:
+        try:
+            dishes.append(coerce_food(item))
+        except DecodeError:
+            dishes.append(None)
+    return dishes
+
+
+def coerce_body(obj):
+    """Body stats with numeric height (cm) and weight (kg), or None if no person was found."""
+    if obj is None:
+        return None
+    if not isinstance(obj, dict):
+        raise DecodeError("Body estimate is not an object")
+    height = number(obj.get('height'))
+    weight = number(obj.get('weight'))
+    if not (50 <= height <= 250 and 20 <= weight <= 350):
+        raise DecodeError(f"Implausible body estimate: {height}cm, {weight}kg")
+    gender = _text(obj.get('gender')).capitalize()
+    return {
+        'gender': gender if gender in ('Male', 'Female') else 'Male',
+        'height': round(height, 1),
+        'weight': round(weight, 1),
+        'body_fat': _text(obj.get('body_fat'), 'Medium').capitalize(),
+    }
+
+
+def _coerce_chat_food(item):
+    return {
+        'food_name': _text(item.get('food_name') or item.get('dish') or item.get('name'), 'Quick Add'),
+        'calories': int(round(number(item.get('calories')))),
+        'protein': round(number(item.get('protein')), 1),
+        'carbs': round(number(item.get('carbs')), 1),
+        'fat': round(number(item.get('fat')), 1),
+    }
+
+
+def coerce_action(obj):
+    """The coach's {"action", "data"} block with an allowed action and numeric data fields."""
+    if not isinstance(obj, dict):
+        raise DecodeError("Coach response is not an object")
+    action = _text(obj.get('action'), 'none').lower()
+    data = obj.get('data') if isinstance(obj.get('data'), dict) else {}
+    if action not in CHAT_ACTIONS:
+        action = 'none'
+
+    clean = {}
+    if action == 'update_goal':
+        goal = int(round(number(data.get('goal_calories'))))
+        if goal > 0:
+            clean['goal_calories'] = goal
+        else:
+            action = 'none'
+    elif action == 'log_food':
+        items = [i for i in data.get('items') or [] if isinstance(i, dict)]
+        if items:
+            clean['items'] = [_coerce_chat_food(i) for i in items]
+        if data.get('food_name') or data.get('calories') is not None:
+            clean.update(_coerce_chat_food(data))
+        if not clean:
+            action = 'none'
+    return {'action': action, 'data': clean}
+
+
+def coerce_chat(obj):
+    """Full coach answer: {"reply": str} plus coerce_action()."""
+    result = coerce_action(obj)
+    result['reply'] = _text(obj.get('reply'))
+    return result
+
+
+SCHEMAS = {
+    'text': coerce_food,
+    'image': coerce_food,
+    'meal': coerce_meal,
+    'body': coerce_body,
+    'chat': coerce_chat,
+    'action': coerce_action,
+}
+
+
+def decode(text, kind):
+    """extract_json() followed by the `kind` schema's validation and coercion."""
+    return SCHEMAS[kind](extract_json(text))
@@ -0,0 +1,81 @@
+import json
+import random
+import re
+import time
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel (GEMINI_BACKEND=fake).
+
+    Answers each FoodClassifier prompt with a fixed, well-formed response
+    after `latency` seconds, so the app can run and be tested without
+    network access or an API key.
+
+    `failure_rate` makes that share of calls raise `fault` instead, and a
+    call slower than its request_options timeout raises TimeoutError, to
+    exercise the retry and circuit-breaker paths. `stream_fault_after`
+    makes streamed replies raise `fault` after that many chunks.
+    """
+
+    FOOD = {
+        "dish": "Paneer Tikka",
+        "nutrition": {"calories": 280, "protein": 18.0, "carbs": 12.0, "fat": 18.0, "unit": "6 pieces"},
+        "vitamins": ["Calcium", "Vitamin B12", "Phosphorus"],
+        "advice": "Good protein source; watch the oil.",
+    }
+    BODY = {"gender": "Male", "height": 175.0, "weight": 72.0, "body_fat": "Medium"}
+    CHAT = {"reply": "Logged. Keep it up.", "action": "none", "data": {}}
+
+    def __init__(self, latency=0.0, failure_rate=0.0, fault=ConnectionError, seed=None,
+                 stream_fault_after=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fault = fault
+        self.stream_fault_after = stream_fault_after
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def generate_content(self, contents, stream=False, request_options=None, **kwargs):
+        self.calls += 1
+        prompt = contents[0] if isinstance(contents, list) else contents
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise self.fault("Injected model failure")
+        timeout = (request_options or {}).get('timeout')
+        if stream:
+            return self._stream(prompt)
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Model call timed out")
+        if self.latency:
+            time.sleep(self.latency)
+        meal = re.search(r'these (\d+) (?:food items|image)', prompt)
+        if 'Fitness AI' in prompt:
+            payload = self.BODY
+        elif meal:
+            count = int(meal.group(1)) if 'food items' in prompt else 2
+            item = {k: self.FOOD[k] for k in ('dish', 'nutrition')}
+            payload = {"items": [item] * count}
+        elif 'Fitness Coach' in prompt:
+            payload = self.CHAT
+        else:
+            payload = self.FOOD
+        return FakeResponse(json.dumps(payload))
+
+    def _stream(self, prompt):
+        # Streamed coach reply: text first, then the action block, in small chunks
+        marker = re.search(r'line containing only (\S+)', prompt).group(1)
+        text = (self.CHAT['reply'] + "\n" + marker + "\n" +
+                json.dumps({"action": self.CHAT['action'], "data": self.CHAT['data']}))
+        chunks = [text[i:i + 8] for i in range(0, len(text), 8)]
+        for n, chunk in enumerate(chunks):
+            if n == self.stream_fault_after:
+                raise self.fault("Injected stream failure")
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield FakeResponse(chunk)
@@ -1,38 +1,173 @@
+import hashlib
 import json
+import mimetypes
 import os
-import google.generativeai as genai
+import threading
+import time
 from flask import current_app
+from app.ml.cache import make_key
+from app.ml.decoding import JSON_RESPONSE_CONFIG, decode
+from app.ml.nutrition import NutritionIndex, split_items
+
+# Bump a version whenever its prompt changes, so cached answers to the old
+# prompt are no longer served.
+PROMPT_VERSIONS = {'text': 1, 'image': 1, 'body': 1, 'meal': 1, 'meal_item': 1}
+
+MEAL_ITEM_SCHEMA = """{
+                    "dish": "Short Standard Name",
+                    "nutrition": {
+                        "calories": integer,
+                        "protein": float (grams),
+                        "carbs": float (grams),
+                        "fat": float (grams),
+                        "unit": "serving size description"
+                    }
+                }"""
 
 class FoodClassifier:
-    def __init__(self, data_path):
+    def __init__(self, data_path, model_name='gemini-2.5-flash', cache=None, local_threshold=0.75,
+                 guard=None, json_mode=True, observer=None):
         self.data_path = data_path
+        self.model_name = model_name
+        self.cache = cache
+        # Optional ModelGuard: deadline, retries, circuit breaker, concurrency cap
+        self.guard = guard
+        # Ask Gemini for bare JSON (response_mime_type) on structured calls
+        self.json_mode = json_mode
+        # Optional observer(kind, seconds, ok) for every model call (see app/metrics.py)
+        self.observer = observer
+        # Text estimates matching calories.json at least this well skip Gemini
+        self.local_threshold = local_threshold
+        self._data_mtime = None
         self.food_data = self._load_data()
         self.classes = list(self.food_data.keys())
-        
+        self.index = NutritionIndex(self.food_data)
+
+        # The Gemini client is built on first use (see `model`), so creating
+        # a classifier never touches the network or the SDK configuration.
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._configure_model()
+        return self._model
+
+    def _configure_model(self):
         # Configure Gemini API
         # Always use environment variables for API keys in production!
         api_key = os.environ.get("GEMINI_API_KEY")
-        
+
         if not api_key:
             print("CRITICAL ERROR: GEMINI_API_KEY is missing in environment variables!")
         else:
             print(f"Gemini API Key found (Length: {len(api_key)}). Configuring...")
 
         try:
+            # Imported here: the SDK costs more to import than the rest of the app
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
+            model = genai.GenerativeModel(self.model_name)
             print("Gemini Model configured successfully.")
+            return model
         except Exception as e:
             print(f"Gemini Configuration Failed: {e}")
+            return None
 
     def _load_data(self):
+        self._data_mtime = os.path.getmtime(self.data_path)
         with open(self.data_path, 'r') as f:
             return json.load(f)
 
+    def reload_if_changed(self):
+        """
+        Re-reads calories.json when its mtime moved since the last load.
+        Returns True if the food data was reloaded.
+        """
+        try:
+            mtime = os.path.getmtime(self.data_path)
+        except OSError:
+            return False
+        if mtime == self._data_mtime:
+            return False
+        with self._lock:
+            if mtime == self._data_mtime:
+                return False
+            food_data = self._load_data()
+            self.food_data = food_data
+            self.classes = list(food_data.keys())
+            self.index = NutritionIndex(food_data)
+        return True
+
+    def _generate(self, contents, kind, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            if self.guard is None:
+                response = self.model.generate_content(contents, **kwargs)
+            else:
+                response = self.guard.call(self.model.generate_content, contents, **kwargs)
+            ok = True
+            return response
+        finally:
+            if self.observer is not None:
+                self.observer(kind, time.perf_counter() - start, ok)
+
+    def _generate_stream(self, contents, kind, **kwargs):
+        """
+        Yields the chunks of a streamed call. The guard's slot, deadline and
+        breaker cover the whole stream, and the observer times it through
+        the last chunk.
+        """
+        start = time.perf_counter()
+        ok = False
+        try:
+            if self.guard is None:
+                yield from self.model.generate_content(contents, stream=True, **kwargs)
+            else:
+                yield from self.guard.stream(self.model.generate_content, contents,
+                                             stream=True, **kwargs)
+            ok = True
+        finally:
+            if self.observer is not None:
+                self.observer(kind, time.perf_counter() - start, ok)
+
+    def _generate_json(self, contents, kind):
+        """A structured call: JSON response mode if enabled, decoded and coerced as `kind`."""
+        if self.json_mode:
+            response = self._generate(contents, kind, generation_config=JSON_RESPONSE_CONFIG)
+        else:
+            response = self._generate(contents, kind)
+        return decode(response.text, kind)
+
+    @staticmethod
+    def _mime_type(image_path, mime_type):
+        return mime_type or mimetypes.guess_type(image_path)[0] or 'image/jpeg'
+
+    def _cache_lookup(self, kind, payload):
+        if self.cache is None:
+            return None, None
+        key = make_key(kind, payload, PROMPT_VERSIONS[kind])
+        return key, self.cache.get(key)
+
+    def _cache_store(self, key, result):
+        if self.cache is not None and key is not None:
+            self.cache.set(key, result)
+
     def estimate_from_text(self, food_description):
         """
         Estimates nutrition from a text description (e.g., "2 eggs and toast")
         """
+        local = self.index.lookup(food_description)
+        if local is not None and local['confidence'] >= self.local_threshold:
+            return local
+
+        cache_key, cached = self._cache_lookup('text', food_description)
+        if cached is not None:
+            return cached
         try:
             prompt = f"""
             You are a Nutritionist API. 
@@ -51,11 +186,104 @@ class FoodClassifier:
                 "vitamins": ["List of 3 key vitamins/minerals"]
             }}
             """
-            response = self.model.generate_content(prompt)
-            text = response.text.strip().replace('```json', '').replace('```', '')
-            return json.loads(text)
+            result = self._generate_json(prompt, 'text')
+            self._cache_store(cache_key, result)
+            return result
         except Exception as e:
             print(f"Error estimating text: {e}")
+            # Model unavailable: a weak calories.json match beats nothing
+            return local
+
+    def estimate_meal(self, items):
+        """
+        Estimates several foods at once ("dal, 2 roti and rice" or a list).
+        Items found in calories.json or the cache are answered locally; all
+        the others go to Gemini together in a single call.
+        Returns one result per item (None where nothing could be estimated).
+        """
+        if isinstance(items, str):
+            items = split_items(items)
+        results = [None] * len(items)
+        pending = []
+        for i, item in enumerate(items):
+            local = self.index.lookup(item)
+            if local is not None and local['confidence'] >= self.local_threshold:
+                results[i] = local
+                continue
+            # Own namespace: answers from the multi-item prompt never mix with estimate_from_text's
+            cache_key, cached = self._cache_lookup('meal_item', item)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, cache_key))
+        if not pending:
+            return results
+
+        try:
+            listing = "\n".join(f"{n + 1}. {items[i]}" for n, (i, _) in enumerate(pending))
+            prompt = f"""
+            You are a Nutritionist API.
+            Analyze each of these {len(pending)} food items separately:
+            {listing}
+
+            Return a JSON object with this key ONLY (no markdown), with exactly
+            one entry per item, in the same order:
+            {{
+                "items": [
+                {MEAL_ITEM_SCHEMA}
+                ]
+            }}
+            """
+            estimates = self._generate_json(prompt, 'meal')
+            for (i, cache_key), estimate in zip(pending, estimates):
+                if estimate is not None:
+                    results[i] = estimate
+                    self._cache_store(cache_key, estimate)
+        except Exception as e:
+            print(f"Error estimating meal: {e}")
+            for i, _ in pending:
+                if results[i] is None:
+                    results[i] = self.index.lookup(items[i])
+        return results
+
+    def predict_meal(self, image_paths, mime_types=None):
+        """
+        Identifies every dish across one or more meal photos (e.g. a thali)
+        in a single Gemini call. Returns a list of dish results, or None.
+        """
+        mime_types = mime_types or [None] * len(image_paths)
+        try:
+            images = []
+            for path in image_paths:
+                with open(path, "rb") as f:
+                    images.append(f.read())
+
+            cache_key, cached = self._cache_lookup('meal', b''.join(
+                hashlib.sha256(data).digest() for data in images))
+            if cached is not None:
+                return cached
+
+            prompt = f"""
+            You are an expert Indian Food Nutritionist.
+            Identify EVERY separate dish visible in these {len(images)} image(s)
+            (e.g. each katori of a thali), with nutrition for the portion shown.
+
+            Return a JSON object with this key ONLY (no markdown):
+            {{
+                "items": [
+                {MEAL_ITEM_SCHEMA}
+                ]
+            }}
+            """
+            parts = [prompt] + [
+                {"mime_type": self._mime_type(path, mime), "data": data}
+                for path, mime, data in zip(image_paths, mime_types, images)
+            ]
+            items = [item for item in self._generate_json(parts, 'meal') if item is not None]
+            self._cache_store(cache_key, items)
+            return items
+        except Exception as e:
+            print(f"Error analyzing meal: {e}")
             return None
 
     def chat_with_coach(self, user_message, user_context):
@@ -73,6 +301,7 @@ class FoodClassifier:
             Your job is to reply helpfully AND take action if needed.
             
             If the user wants to log food (e.g., "I ate an apple"), set action="log_food".
+            If they ate several foods, also list each one in data.items.
             If the user changes goals (e.g., "I want to bulk", "Set calories to 3000"), set action="update_goal".
             Otherwise, set action="none".
             
@@ -82,26 +311,100 @@ class FoodClassifier:
                 "action": "none" OR "log_food" OR "update_goal",
                 "data": {{
                     "food_name": "Apple", "calories": 95, "protein": 0.5 (if logging food),
+                    "items": [{{"food_name": "Dal", "calories": 180, "protein": 9}}] (if several foods),
                     "goal_calories": 3000 (if updating goal)
                 }}
             }}
             """
-            response = self.model.generate_content(prompt)
-            text = response.text.strip().replace('```json', '').replace('```', '')
-            return json.loads(text)
+            return self._generate_json(prompt, 'chat')
         except Exception as e:
             print(f"Chat Error: {e}")
             return {"reply": "I'm having trouble thinking right now.", "action": "none"}
 
-    def analyze_body(self, image_path):
+    ACTION_MARKER = "===ACTION==="
+
+    def stream_chat_with_coach(self, user_message, user_context):
+        """
+        Streaming variant of chat_with_coach.
+        Yields ("token", text) as the reply is generated, then exactly one
+        ("done", { "reply", "action", "data" }) once the trailing action
+        block has been parsed.
+        """
+        marker = self.ACTION_MARKER
+        reply, tail, buffer = [], None, ""
+        try:
+            prompt = f"""
+            You are a personal Fitness Coach named 'Titan Coach'.
+            User Context: {user_context}
+            User Message: "{user_message}"
+            
+            Your job is to reply helpfully AND take action if needed.
+            
+            If the user wants to log food (e.g., "I ate an apple"), set action="log_food".
+            If they ate several foods, also list each one in data.items.
+            If the user changes goals (e.g., "I want to bulk", "Set calories to 3000"), set action="update_goal".
+            Otherwise, set action="none".
+            
+            First write your reply to the user as plain text (no JSON, no markdown).
+            Then write a line containing only {marker} followed by a JSON object ONLY:
+            {{
+                "action": "none" OR "log_food" OR "update_goal",
+                "data": {{
+                    "food_name": "Apple", "calories": 95, "protein": 0.5 (if logging food),
+                    "items": [{{"food_name": "Dal", "calories": 180, "protein": 9}}] (if several foods),
+                    "goal_calories": 3000 (if updating goal)
+                }}
+            }}
+            """
+            for chunk in self._generate_stream(prompt, 'chat_stream'):
+                text = chunk.text or ""
+                if tail is not None:
+                    tail += text
+                    continue
+                buffer += text
+                if marker in buffer:
+                    before, tail = buffer.split(marker, 1)
+                    if before:
+                        reply.append(before)
+                        yield "token", before
+                    continue
+                # Hold back anything that could be the start of a split marker
+                safe = len(buffer) - len(marker) + 1
+                if safe > 0:
+                    reply.append(buffer[:safe])
+                    yield "token", buffer[:safe]
+                    buffer = buffer[safe:]
+            if tail is None and buffer:
+                reply.append(buffer)
+                yield "token", buffer
+        except Exception as e:
+            print(f"Chat Stream Error: {e}")
+            if not reply:
+                message = "I'm having trouble thinking right now."
+                reply.append(message)
+                yield "token", message
+
+        result = {"reply": "".join(reply).strip(), "action": "none", "data": {}}
+        if tail:
+            try:
+                result.update(decode(tail, 'action'))
+            except Exception as e:
+                print(f"Chat Action Parse Error: {e}")
+        yield "done", result
+
+    def analyze_body(self, image_path, mime_type=None):
         """
         Estimates physical stats from a full-body photo.
         """
         try:
             with open(image_path, "rb") as f:
                 image_data = f.read()
+
+            cache_key, cached = self._cache_lookup('body', image_data)
+            if cached is not None:
+                return cached
             
-            image_parts = [{"mime_type": "image/jpeg", "data": image_data}]
+            image_parts = [{"mime_type": self._mime_type(image_path, mime_type), "data": image_data}]
 
             prompt = """
             You are a Fitness AI. Analyze the person in this photo for the purpose of calculating BMI and Calorie Goals.
@@ -121,15 +424,15 @@ class FoodClassifier:
             If you strictly cannot determine a human is present, return null.
             """
             
-            response = self.model.generate_content([prompt, image_parts[0]])
-            text = response.text.strip().replace('```json', '').replace('```', '')
-            return json.loads(text)
+            result = self._generate_json([prompt, image_parts[0]], 'body')
+            self._cache_store(cache_key, result)
+            return result
             
         except Exception as e:
             print(f"Body Analysis Error: {e}")
             return None
 
-    def predict(self, image_path):
+    def predict(self, image_path, mime_type=None):
         """
         Uses Gemini Vision to identify the food item.
         """
@@ -137,10 +440,14 @@ class FoodClassifier:
             # 1. Prepare the image for Gemini
             with open(image_path, "rb") as f:
                 image_data = f.read()
+
+            cache_key, cached = self._cache_lookup('image', image_data)
+            if cached is not None:
+                return cached
             
             image_parts = [
                 {
-                    "mime_type": "image/jpeg", # Assumes jpeg/png
+                    "mime_type": self._mime_type(image_path, mime_type),
                     "data": image_data
                 }
             ]
@@ -169,9 +476,9 @@ class FoodClassifier:
             """
 
             # 3. Call Gemini API
-            response = self.model.generate_content([prompt, image_parts[0]])
-            result_text = response.text.strip().replace('```json', '').replace('```', '')
-            return json.loads(result_text)
+            result = self._generate_json([prompt, image_parts[0]], 'image')
+            self._cache_store(cache_key, result)
+            return result
 
         except Exception as e:
             print(f"Error calling Gemini: {e}")
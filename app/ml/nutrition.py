@@ -0,0 +1,254 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'dozen': 12,
+    'couple': 2, 'half': 0.5, 'quarter': 0.25,
+}
+
+# Serving words carry no dish identity ("2 plates of biryani")
+FILLER_WORDS = {
+    'of', 'the', 'some', 'piece', 'pc', 'pcs', 'plate', 'bowl', 'serving',
+    'cup', 'glass', 'slice', 'small', 'medium', 'large', 'big', 'i', 'ate',
+    'had', 'have', 'eat', 'my', 'x',
+}
+
+SEPARATORS = re.compile(r',|;|\+|&|\n|\band\b|\bwith\b|\bplus\b')
+TOKEN_RE = re.compile(r'\d+/\d+|\d+(?:\.\d+)?g?|[a-z]+')
+AMOUNT_RE = re.compile(r'-?\d+(?:\.\d+)?')
+GRAMS_RE = re.compile(r'(\d+(?:\.\d+)?)\s*g\b')
+
+# Spelling corrections must share at least this Dice coefficient of trigrams
+MIN_CORRECTION = 0.6
+# Bounds on the shortlist scored per item, so common tokens ("chicken", "rice")
+# in a 100k-dish catalog don't turn a lookup into a scan of their postings
+MAX_POSTINGS = 256
+MAX_CANDIDATES = 1024
+
+
+def parse_amount(value):
+    """'3.5g' -> 3.5, 262 -> 262.0, anything unparseable -> 0.0"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = AMOUNT_RE.search(str(value or ''))
+    return float(match.group()) if match else 0.0
+
+
+def singular(token):
+    if len(token) <= 3:
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith(('ches', 'shes', 'xes', 'ses', 'oes')):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [singular(t) if t.isalpha() else t for t in TOKEN_RE.findall(text.lower())]
+
+
+def split_items(text):
+    """'dal, 2 roti and rice' -> ['dal', '2 roti', 'rice']"""
+    return [s.strip() for s in SEPARATORS.split((text or '').lower()) if s.strip()]
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NutritionIndex:
+    """
+    In-memory lookup over calories.json.
+
+    Macros are parsed once into a float matrix (one row per dish, columns in
+    MACROS order). Dish names and their aliases are indexed by token, and
+    every vocabulary token by character trigram so misspellings still land on
+    a candidate without scanning the catalog.
+
+    Lookups stay bounded however large the catalog: an exact token-set
+    match is a dict hit; otherwise only the first MAX_POSTINGS aliases of
+    each query token (shortest names first, the likeliest best match) make
+    the shortlist, and trigram postings are bucketed by token length so a
+    correction only reads tokens long enough to reach MIN_CORRECTION.
+    """
+
+    def __init__(self, food_data):
+        self.names = list(food_data.keys())
+        self.units = [str(food_data[n].get('unit', '1 serving')) for n in self.names]
+        self.macros = np.array(
+            [[parse_amount(food_data[n].get(m)) for m in MACROS] for n in self.names],
+            dtype=np.float64).reshape(len(self.names), len(MACROS))
+        self.unit_grams = np.array(
+            [parse_amount(g.group(1)) if (g := GRAMS_RE.search(u.lower())) else np.nan
+             for u in self.units], dtype=np.float64)
+
+        # alias id -> (dish index, token set)
+        self.aliases = []
+        self.postings = defaultdict(list)
+        # token set -> first alias spelled exactly with it
+        self.exact = {}
+        # (trigram, trigram count of the token) -> tokens
+        self.trigram_postings = defaultdict(set)
+        for dish_idx, name in enumerate(self.names):
+            spellings = [name] + list(food_data[name].get('aliases', []))
+            for spelling in spellings:
+                tokens = frozenset(t for t in tokenize(spelling) if t.isalpha())
+                if not tokens:
+                    continue
+                alias_id = len(self.aliases)
+                self.aliases.append((dish_idx, tokens))
+                self.exact.setdefault(tokens, alias_id)
+                for token in tokens:
+                    self.postings[token].append(alias_id)
+        for token, alias_ids in self.postings.items():
+            alias_ids.sort(key=lambda a: len(self.aliases[a][1]))
+            grams = trigrams(token)
+            for gram in grams:
+                self.trigram_postings[gram, len(grams)].add(token)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _correct(self, token):
+        """Maps an unknown token to the closest vocabulary token by trigram overlap."""
+        if token in self.postings:
+            return token, 1.0
+        grams = trigrams(token)
+        size = len(grams)
+        # Dice >= MIN_CORRECTION is out of reach for tokens much shorter or longer
+        low = math.ceil(size * MIN_CORRECTION / (2 - MIN_CORRECTION))
+        high = math.floor(size * (2 - MIN_CORRECTION) / MIN_CORRECTION)
+        best, best_score = None, 0.0
+        for other in range(low, high + 1):
+            overlap = Counter()
+            for gram in grams:
+                overlap.update(self.trigram_postings.get((gram, other), ()))
+            for candidate, shared in overlap.items():
+                score = 2.0 * shared / (size + other)
+                if score > best_score or (score == best_score and candidate < best):
+                    best, best_score = candidate, score
+        if best_score < MIN_CORRECTION:
+            return None, 0.0
+        return best, best_score
+
+    def _shortlist(self, query):
+        """Alias ids worth scoring for `query`, rarest tokens first, at most MAX_CANDIDATES."""
+        candidates = {}
+        for token in sorted(query, key=lambda t: len(self.postings.get(t, ()))):
+            for alias_id in self.postings.get(token, ())[:MAX_POSTINGS]:
+                candidates.setdefault(alias_id, None)
+                if len(candidates) >= MAX_CANDIDATES:
+                    return candidates
+        return candidates
+
+    def _parse_segment(self, segment):
+        """Splits one item ("2 plates of chicken biryani") into quantity, grams and name tokens."""
+        quantity, grams, words = None, None, []
+        for token in tokenize(segment):
+            if token in NUMBER_WORDS and not words:
+                # "a dozen", "2 dozen", "half a"
+                if token in ('a', 'an') and quantity is not None:
+                    continue
+                quantity = NUMBER_WORDS[token] * (quantity if quantity not in (None, 1) else 1)
+            elif token[0].isdigit():
+                if token.endswith('g'):
+                    grams = float(token[:-1])
+                elif '/' in token:
+                    num, den = token.split('/')
+                    quantity = float(num) / float(den) if float(den) else None
+                else:
+                    quantity = float(token)
+            elif token == 'gram' and quantity is not None:
+                grams, quantity = quantity, None
+            elif token not in FILLER_WORDS:
+                words.append(token)
+        return quantity, grams, words
+
+    def match_item(self, segment):
+        """
+        Returns (dish index, quantity, confidence) for a single food item,
+        or None if nothing in the catalog resembles it.
+        """
+        quantity, grams, words = self._parse_segment(segment)
+        if not words:
+            return None
+
+        query, penalty = set(), 1.0
+        for word in words:
+            corrected, score = self._correct(word)
+            if corrected is None:
+                # Unknown word still counts against the match
+                query.add(word)
+                continue
+            query.add(corrected)
+            penalty *= score
+
+        best_alias = self.exact.get(frozenset(query))
+        best_score = 1.0
+        if best_alias is None:
+            best_score = 0.0
+            for alias_id in self._shortlist(query):
+                tokens = self.aliases[alias_id][1]
+                score = len(query & tokens) / len(query | tokens)
+                if score > best_score or (score == best_score and alias_id < best_alias):
+                    best_alias, best_score = alias_id, score
+            if best_alias is None:
+                return None
+
+        dish_idx = self.aliases[best_alias][0]
+        confidence = best_score * penalty
+        if grams is not None:
+            serving = self.unit_grams[dish_idx]
+            if np.isnan(serving):
+                # Can't convert weight to servings for this dish
+                quantity, confidence = 1.0, confidence * 0.5
+            else:
+                quantity = grams / serving
+        return dish_idx, float(quantity or 1.0), confidence
+
+    def lookup(self, text):
+        """
+        Estimates a whole description ("2 idli and half samosa").
+        Returns a result shaped like FoodClassifier.estimate_from_text plus
+        a `confidence` in [0, 1] (the weakest item's match score).
+        """
+        segments = split_items(text)
+        if not segments:
+            return None
+
+        matches = []
+        for segment in segments:
+            match = self.match_item(segment)
+            if match is None:
+                return None
+            matches.append(match)
+
+        idx = np.fromiter((m[0] for m in matches), dtype=np.intp, count=len(matches))
+        qty = np.fromiter((m[1] for m in matches), dtype=np.float64, count=len(matches))
+        totals = qty @ self.macros[idx]
+
+        dish = ", ".join(self.names[i] for i in idx)
+        unit = ", ".join(f"{round(q, 2):g} x {self.units[i]}" for i, q in zip(idx, qty))
+        return {
+            "dish": dish,
+            "nutrition": {
+                "calories": int(round(totals[0])),
+                "protein": round(float(totals[1]), 1),
+                "carbs": round(float(totals[2]), 1),
+                "fat": round(float(totals[3]), 1),
+                "unit": unit,
+            },
+            "vitamins": [],
+            "source": "local",
+            "confidence": round(min(m[2] for m in matches), 3),
+        }
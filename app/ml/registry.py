@@ -0,0 +1,116 @@
+import os
+import threading
+
+from app.ml.cache import ResponseCache, MongoCacheStore
+from app.ml.fake import FakeGenerativeModel
+from app.ml.resilience import CircuitBreaker, ModelGuard
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'calories.json')
+
+
+class ClassifierRegistry:
+    """
+    Per-worker home of the shared FoodClassifier.
+
+    The classifier (and its Gemini client) is built lazily on the first
+    `get()` and then reused by every request and thread in the process.
+    calories.json is re-read whenever its mtime changes.
+    """
+
+    def __init__(self, app=None):
+        self.data_path = os.path.normpath(DEFAULT_DATA_PATH)
+        self.model_name = 'gemini-2.5-flash'
+        self.local_threshold = 0.75
+        # 'gemini', or 'fake' for the offline stub model
+        self.backend = 'gemini'
+        self.fake_latency = 0.0
+        self.fake_failure_rate = 0.0
+        self.json_mode = True
+        self.observer = None
+        self.cache = ResponseCache()
+        self.guard = ModelGuard()
+        self._classifier = None
+        self._built_with = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.data_path = os.path.normpath(app.config.get(
+            'CALORIES_DATA_PATH',
+            os.path.join(app.root_path, '..', 'data', 'calories.json')))
+        self.model_name = app.config.get('GEMINI_MODEL', self.model_name)
+        self.local_threshold = app.config.get('LOCAL_MATCH_THRESHOLD', self.local_threshold)
+        self.backend = app.config.get('GEMINI_BACKEND', self.backend)
+        self.fake_latency = app.config.get('FAKE_MODEL_LATENCY', self.fake_latency)
+        self.fake_failure_rate = app.config.get('FAKE_MODEL_FAILURE_RATE', self.fake_failure_rate)
+        self.json_mode = app.config.get('GEMINI_JSON_MODE', self.json_mode)
+        metrics = app.extensions.get('metrics')
+        self.observer = metrics.observe_model_call if metrics else None
+
+        # Every model call shares one deadline/retry policy and breaker per worker
+        self.guard = ModelGuard(
+            timeout=app.config.get('GEMINI_TIMEOUT', 20.0),
+            retries=app.config.get('GEMINI_RETRIES', 2),
+            max_concurrent=app.config.get('GEMINI_MAX_CONCURRENT', 8),
+            breaker=CircuitBreaker(
+                failure_threshold=app.config.get('BREAKER_THRESHOLD', 5),
+                reset_timeout=app.config.get('BREAKER_RESET', 30.0)))
+
+        # Gemini response cache: in-memory LRU, optionally backed by MongoDB
+        store = MongoCacheStore() if app.config.get('AI_CACHE_STORE') == 'mongo' else None
+        self.cache = ResponseCache(
+            max_entries=app.config.get('AI_CACHE_SIZE', 1024),
+            ttl=app.config.get('AI_CACHE_TTL', 24 * 3600),
+            store=store)
+        if self._classifier is not None and self._built_with != self._build_settings():
+            # Warmed up with another data file, model or backend: rebuild on next get()
+            self.reset()
+        elif self._classifier is not None:
+            # Warmed up before the app was configured
+            self._classifier.cache = self.cache
+            self._classifier.guard = self.guard
+            self._classifier.json_mode = self.json_mode
+            self._classifier.observer = self.observer
+            self._classifier.local_threshold = self.local_threshold
+        app.extensions['classifier_registry'] = self
+
+    def _build_settings(self):
+        # What the classifier is constructed from; the rest is patched onto it in init_app
+        return (self.data_path, self.model_name, self.backend,
+                self.fake_latency, self.fake_failure_rate)
+
+    def get(self):
+        classifier = self._classifier
+        if classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    # Deferred: pulls in numpy and the nutrition index
+                    from app.ml.model import FoodClassifier
+                    self._classifier = FoodClassifier(self.data_path, model_name=self.model_name,
+                                                      cache=self.cache,
+                                                      local_threshold=self.local_threshold,
+                                                      guard=self.guard, json_mode=self.json_mode,
+                                                      observer=self.observer)
+                    if self.backend == 'fake':
+                        self._classifier._model = FakeGenerativeModel(
+                            latency=self.fake_latency, failure_rate=self.fake_failure_rate)
+                    self._built_with = self._build_settings()
+                classifier = self._classifier
+        else:
+            classifier.reload_if_changed()
+        return classifier
+
+    def warm_up(self):
+        """
+        Builds the classifier and its Gemini client ahead of the first request.
+        Meant to be called once per worker, e.g. from gunicorn's `post_worker_init`,
+        so the client is never shared across a fork.
+        """
+        classifier = self.get()
+        return classifier.model is not None
+
+    def reset(self):
+        with self._lock:
+            self._classifier = None
+            self._built_with = None
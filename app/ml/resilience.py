@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ModelUnavailable(Exception):
+    """The model call was refused without being attempted."""
+
+
+class CircuitOpen(ModelUnavailable):
+    """Upstream has been failing; calls fail fast until the breaker resets."""
+
+
+class ModelBusy(ModelUnavailable):
+    """Too many model calls already in flight in this process."""
+
+
+_transient = None
+
+
+def transient_errors():
+    """Exception types worth retrying; resolved on first use to keep the SDK out of startup."""
+    global _transient
+    if _transient is None:
+        errors = [TimeoutError, ConnectionError]
+        try:
+            from google.api_core import exceptions as gexc
+            errors += [gexc.ServiceUnavailable, gexc.DeadlineExceeded, gexc.InternalServerError,
+                       gexc.TooManyRequests, gexc.ResourceExhausted]
+        except ImportError:
+            pass
+        _transient = tuple(errors)
+    return _transient
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open every
+    call is refused; after `reset_timeout` seconds one trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def admit(self):
+        """'call', 'trial' (the single half-open probe) or None if the call is refused."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return 'call'
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return 'trial'
+            return None
+
+    def allow(self):
+        return self.admit() is not None
+
+    def abandon_trial(self):
+        """The trial ended without an outcome (e.g. never ran): let another call probe."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ModelGuard:
+    """
+    Wraps every model call with a deadline, jittered exponential retry on
+    transient errors, a circuit breaker and a process-wide concurrency cap.
+
+    `timeout` is the total budget for a call including retries; each attempt
+    gets what is left of it through the SDK's request_options.
+    """
+
+    def __init__(self, timeout=20.0, retries=2, backoff=0.5, max_backoff=4.0,
+                 max_concurrent=8, acquire_timeout=5.0, breaker=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    @contextmanager
+    def _admitted(self):
+        """Holds a concurrency slot and the breaker's go-ahead; yields the call's deadline."""
+        # Slot first: a refused slot must not leave a half-open trial claimed
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise ModelBusy("Too many concurrent model calls")
+        try:
+            admission = self.breaker.admit()
+            if admission is None:
+                raise CircuitOpen("Model circuit is open")
+            try:
+                yield time.monotonic() + self.timeout
+            finally:
+                # Success and failure already cleared the trial; anything else must too
+                if admission == 'trial':
+                    self.breaker.abandon_trial()
+        finally:
+            self._slots.release()
+
+    def _record(self, error):
+        if isinstance(error, transient_errors()):
+            self.breaker.record_failure()
+        else:
+            # Upstream answered (e.g. a rejected request): not a health problem
+            self.breaker.record_success()
+
+    def _attempt(self, fn, args, kwargs, deadline, record_success=True):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError("Model call deadline exceeded")
+                result = fn(*args, request_options={'timeout': remaining}, **kwargs)
+            except Exception as e:
+                if not isinstance(e, transient_errors()):
+                    self._record(e)
+                    raise
+                # Full jitter: sleep a random slice of the exponential step
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                attempt += 1
+                if attempt > self.retries or time.monotonic() + delay >= deadline:
+                    self._record(e)
+                    raise
+                print(f"Model call failed ({e!r}), retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            if record_success:
+                self.breaker.record_success()
+            return result
+
+    def call(self, fn, *args, **kwargs):
+        with self._admitted() as deadline:
+            return self._attempt(fn, args, kwargs, deadline)
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Generator over a streamed call (`fn(..., stream=True)`). Opening the
+        stream is retried like `call`; the slot stays held and the deadline
+        is checked between chunks until the last one, and only then does
+        the breaker count a success. Chunks already yielded can't be
+        replayed, so an error mid-stream is counted but not retried.
+        """
+        with self._admitted() as deadline:
+            chunks = self._attempt(fn, args, kwargs, deadline, record_success=False)
+            try:
+                for chunk in chunks:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError("Model stream deadline exceeded")
+                    yield chunk
+            except Exception as e:
+                self._record(e)
+                raise
+            self.breaker.record_success()
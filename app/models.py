@@ -2,9 +2,13 @@ from flask_login import UserMixin
 import mongoengine as db
 from datetime import datetime
 
+# Only logs written by the offline sync carry a client_id
+CLIENT_ID_INDEX = {'fields': ['client_id'], 'unique': True, 'sparse': True}
+
 class User(UserMixin, db.Document):
     username = db.StringField(max_length=150, unique=True, required=True)
-    password = db.StringField(max_length=150, required=True)
+    # werkzeug hash, or an unusable '!' value for Google accounts (see app/passwords.py)
+    password = db.StringField(max_length=255, required=True)
     
     # Physical Stats
     height = db.FloatField() # in cm
@@ -30,16 +34,111 @@ class FoodLog(db.Document):
     carbs = db.FloatField()
     fat = db.FloatField()
     image_file = db.StringField(max_length=100)
+    thumb_file = db.StringField(max_length=100)
     date_posted = db.DateTimeField(default=datetime.now)
+    # Id of an action queued offline (see app/sync.py); replays are no-ops
+    client_id = db.StringField(max_length=64)
+
+    meta = {
+        'indexes': [('user', '-date_posted'), CLIENT_ID_INDEX],
+        # Built by `flask create-indexes`, not on first access in each worker
+        'auto_create_index': False,
+        'index_background': True,
+    }
 
 class WaterLog(db.Document):
     user = db.ReferenceField(User, reverse_delete_rule=db.CASCADE)
     amount = db.IntField(default=1) # 1 glass
     date_posted = db.DateTimeField(default=datetime.now)
+    client_id = db.StringField(max_length=64)
+
+    meta = {
+        'indexes': [('user', '-date_posted'), CLIENT_ID_INDEX],
+        'auto_create_index': False,
+        'index_background': True,
+    }
 
 class ExerciseLog(db.Document):
     user = db.ReferenceField(User, reverse_delete_rule=db.CASCADE)
     activity_name = db.StringField(max_length=100, required=True)
     duration_minutes = db.IntField(required=True)
     calories_burned = db.IntField()
+    # Intensity the burn was computed from; lets burns follow weight changes
+    met = db.FloatField()
     date_posted = db.DateTimeField(default=datetime.now)
+    client_id = db.StringField(max_length=64)
+
+    meta = {
+        'indexes': [('user', '-date_posted'), CLIENT_ID_INDEX],
+        'auto_create_index': False,
+        'index_background': True,
+    }
+
+class CachedResponse(db.Document):
+    # Persistent tier of the Gemini response cache (see app/ml/cache.py)
+    key = db.StringField(max_length=64, required=True, unique=True)
+    value = db.DynamicField()
+    expires_at = db.DateTimeField(required=True)
+
+    meta = {
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ],
+        'auto_create_index': False,
+        'index_background': True,
+    }
+
+class DailyRollup(db.Document):
+    # Per-user per-day totals, kept current with $inc on every log write
+    # (see app/rollups.py). `day` is midnight of the local day.
+    user = db.ReferenceField(User, reverse_delete_rule=db.CASCADE)
+    day = db.DateTimeField(required=True)
+    calories_in = db.IntField(default=0)
+    calories_out = db.IntField(default=0)
+    protein = db.FloatField(default=0)
+    carbs = db.FloatField(default=0)
+    fat = db.FloatField(default=0)
+    water = db.IntField(default=0) # glasses
+    food_count = db.IntField(default=0)
+    exercise_count = db.IntField(default=0)
+    # Bumped by every write to the day; the data version behind API ETags
+    version = db.IntField(default=0)
+
+    meta = {
+        'indexes': [{'fields': ['user', 'day'], 'unique': True}],
+        'auto_create_index': False,
+        'index_background': True,
+    }
+
+class AnalysisJob(db.Document):
+    # Background image analysis (see app/jobs.py); expires a day after creation
+    user = db.ReferenceField(User, reverse_delete_rule=db.CASCADE)
+    kind = db.StringField(max_length=10, required=True) # 'food' or 'body'
+    status = db.StringField(max_length=10, default='queued') # queued, running, done, failed
+    result = db.DynamicField()
+    error = db.StringField()
+    image_file = db.StringField(max_length=100)
+    thumb_file = db.StringField(max_length=100)
+    created = db.DateTimeField(default=datetime.utcnow)
+    started = db.DateTimeField()
+    finished = db.DateTimeField()
+
+    meta = {
+        'indexes': [{'fields': ['created'], 'expireAfterSeconds': 24 * 3600}],
+        'auto_create_index': False,
+        'index_background': True,
+    }
+
+
+class PendingAnalysis(db.Document):
+    # A food estimate waiting for the user to eat or discard it on /advisor;
+    # the session only holds its id. Expires a day after creation.
+    user = db.ReferenceField(User, reverse_delete_rule=db.CASCADE)
+    result = db.DynamicField()
+    created = db.DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'indexes': [{'fields': ['created'], 'expireAfterSeconds': 24 * 3600}],
+        'auto_create_index': False,
+        'index_background': True,
+    }
@@ -0,0 +1,140 @@
+import hashlib
+import hmac
+import secrets
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app.ml.cache import ResponseCache
+
+# Stored passwords starting with this never verify (accounts that sign in through Google)
+UNUSABLE_PREFIX = '!'
+# What Google accounts were created with before passwords were hashed
+LEGACY_OAUTH_PASSWORD = 'google_oauth_dummy_password'
+HASH_METHODS = ('scrypt:', 'pbkdf2:')
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_METHODS) and stored.count('$') == 2
+
+
+def unusable():
+    """A password field value that matches no password."""
+    return UNUSABLE_PREFIX + secrets.token_hex(16)
+
+
+class PasswordHasher:
+    """
+    Password hashing and verification with werkzeug's KDFs.
+
+    `method` is any werkzeug method string, e.g. 'scrypt:32768:8:1' or
+    'pbkdf2:sha256:600000', so the cost is configuration. KDFs run on the
+    request thread (hashlib releases the GIL) but at most `max_concurrent`
+    at a time per process: a burst of logins queues instead of taking
+    every core, and scrypt's ~32 MB per hash stays bounded however many
+    request threads the server runs.
+
+    Every failed check costs one KDF, including unknown users, accounts
+    without a usable password and legacy plaintext rows, so response
+    times don't tell which usernames exist.
+
+    `verify` upgrades the stored value when it succeeds against a legacy
+    plaintext password or a hash made with another method. A successful
+    check is remembered for `cache_ttl` seconds as an HMAC of the
+    password keyed by the app secret and the stored hash, so a user
+    signing in again shortly (new device, expired session) skips the KDF;
+    changing the password changes the hash and so invalidates the entry.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt:32768:8:1'
+        self.max_concurrent = 2
+        self.cache_ttl = 300
+        self.secret = b''
+        self.cache = ResponseCache(1024, self.cache_ttl)
+        self._prefix = None
+        self._dummy = None
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.max_concurrent = app.config.get('PASSWORD_MAX_CONCURRENT', self.max_concurrent)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self.cache_ttl = app.config.get('PASSWORD_CACHE_TTL', self.cache_ttl)
+        self.secret = str(app.config['SECRET_KEY']).encode()
+        self.cache = ResponseCache(app.config.get('PASSWORD_CACHE_SIZE', 1024), self.cache_ttl)
+        self._prefix = None
+        self._dummy = None
+        app.extensions['passwords'] = self
+
+    @property
+    def dummy(self):
+        """A hash made with the current method, checked when there is nothing real to check."""
+        if self._dummy is None:
+            self._dummy = self.hash(secrets.token_hex(16))
+        return self._dummy
+
+    @property
+    def prefix(self):
+        """Method part of hashes made now, with werkzeug's defaults filled in ('scrypt' -> 'scrypt:32768:8:1')."""
+        if self._prefix is None:
+            self._prefix = self.dummy.split('$', 1)[0]
+        return self._prefix
+
+    def hash(self, password):
+        with self._slots:
+            return generate_password_hash(password, self.method)
+
+    def _kdf_check(self, stored, password):
+        with self._slots:
+            return check_password_hash(stored, password)
+
+    def needs_rehash(self, stored):
+        return not stored.startswith(UNUSABLE_PREFIX) and \
+            stored.split('$', 1)[0] != self.prefix
+
+    def _cache_key(self, user, stored, password):
+        msg = f'{user.pk}\0{stored}\0{password}'.encode()
+        return hmac.new(self.secret, msg, hashlib.sha256).hexdigest()
+
+    def check(self, stored, password):
+        """Whether `password` matches `stored` (a hash, legacy plaintext, unusable value or None)."""
+        password = password or ''
+        if stored and is_hashed(stored):
+            return self._kdf_check(stored, password) and bool(password)
+        # Nothing to derive: spend a KDF on the dummy anyway so this is not measurably faster
+        self._kdf_check(self.dummy, password)
+        if not stored or not password or stored.startswith(UNUSABLE_PREFIX) \
+                or stored == LEGACY_OAUTH_PASSWORD:
+            return False
+        return hmac.compare_digest(stored.encode(), password.encode())
+
+    def reject(self, password):
+        """Spends the same KDF time as a failed check, for logins naming no user."""
+        self.check(None, password)
+        return False
+
+    def verify(self, user, password, users=None):
+        """
+        Checks `password` against `user`, rehashing it when the stored
+        value is outdated. `users` (a UserCache) writes the new hash.
+        """
+        stored = user.password or ''
+        key = self._cache_key(user, stored, password or '') if self.cache_ttl else None
+        if key and self.cache.get(key):
+            return True
+        if not self.check(stored, password):
+            return False
+        if self.needs_rehash(stored):
+            stored = self.hash(password)
+            if users is not None:
+                users.update(user, password=stored)
+            else:
+                user.update(set__password=stored)
+                user.password = stored
+            key = self._cache_key(user, stored, password) if self.cache_ttl else None
+        if key:
+            self.cache.set(key, True)
+        return True
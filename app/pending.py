@@ -0,0 +1,41 @@
+"""
+Server-side home of food estimates awaiting confirmation on /advisor.
+
+The full model result (dish, nutrition, vitamins, advice, image names)
+lives in a PendingAnalysis document; the signed session cookie carries
+only its id, so every request stays small and cheap to verify.
+"""
+from app.models import PendingAnalysis
+
+SESSION_KEY = 'pending_food'
+
+
+def stash(session, user, result):
+    """Stores `result` for `user` and points the session at it."""
+    discard(session, user)
+    pending = PendingAnalysis(user=user, result=result)
+    pending.save()
+    session[SESSION_KEY] = str(pending.id)
+    return pending
+
+
+def fetch(session, user):
+    """The session's pending result, or None (nothing pending, expired or someone else's)."""
+    pending_id = session.get(SESSION_KEY)
+    if not pending_id:
+        return None
+    try:
+        pending = PendingAnalysis.objects(pk=pending_id, user=user).only('result').first()
+    except Exception:
+        pending = None
+    if pending is None:
+        session.pop(SESSION_KEY, None)
+        return None
+    return pending.result
+
+
+def discard(session, user):
+    """Drops the session's pending result, if any."""
+    pending_id = session.pop(SESSION_KEY, None)
+    if pending_id:
+        PendingAnalysis.objects(pk=pending_id, user=user).delete()
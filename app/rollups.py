@@ -0,0 +1,154 @@
+"""
+Incremental per-user daily totals.
+
+Every log write applies a $inc to the user's DailyRollup for that day, so
+dashboard and stats reads cost O(days) instead of O(log entries).
+`rebuild()` recomputes rollups from the raw logs, e.g. after the first
+deploy or to repair drift.
+"""
+import time
+from datetime import datetime, date, timedelta
+
+from pymongo import ReturnDocument, UpdateOne
+
+from app.models import DailyRollup, FoodLog, WaterLog, ExerciseLog
+
+
+def day_of(when=None):
+    """Midnight of the day a log belongs to."""
+    when = when or datetime.now()
+    if not isinstance(when, datetime):
+        when = datetime.combine(when, datetime.min.time())
+    return datetime.combine(when.date(), datetime.min.time())
+
+
+def _user_id(user):
+    return getattr(user, 'id', user)
+
+
+def _inc(user, when, deltas, return_field=None):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return None
+    deltas['version'] = 1
+    collection = DailyRollup._get_collection()
+    query = {'user': _user_id(user), 'day': day_of(when)}
+    if return_field is None:
+        collection.update_one(query, {'$inc': deltas}, upsert=True)
+        return None
+    doc = collection.find_one_and_update(
+        query, {'$inc': deltas}, upsert=True,
+        projection={return_field: 1}, return_document=ReturnDocument.AFTER)
+    return doc.get(return_field, 0)
+
+
+def food_changed(user, when, calories=0, protein=0, carbs=0, fat=0, sign=1, count=1):
+    _inc(user, when, {
+        'calories_in': sign * int(calories or 0),
+        'protein': sign * float(protein or 0),
+        'carbs': sign * float(carbs or 0),
+        'fat': sign * float(fat or 0),
+        'food_count': sign * count,
+    })
+
+
+def exercise_changed(user, when, calories_burned=0, sign=1, count=1):
+    _inc(user, when, {
+        'calories_out': sign * int(calories_burned or 0),
+        'exercise_count': sign * count,
+    })
+
+
+def totals_changed(user, when, deltas):
+    """Applies several rollup field deltas to one day at once, e.g. after a bulk import."""
+    _inc(user, when, deltas)
+
+
+def water_changed(user, when, sign=1, count=1):
+    """Returns the day's new glass count."""
+    return _inc(user, when, {'water': sign * count}, return_field='water')
+
+
+def rollup_for(user, day=None):
+    """The DailyRollup for one day, or an unsaved all-zero one."""
+    day = day_of(day)
+    return DailyRollup.objects(user=user, day=day).first() or DailyRollup(user=user, day=day)
+
+
+def rollups_between(user, start, end):
+    """{day: DailyRollup} for start..end inclusive (days without logs are absent)."""
+    rows = DailyRollup.objects(user=user, day__gte=day_of(start), day__lte=day_of(end))
+    return {r.day.date(): r for r in rows}
+
+
+# --- Rebuild ---
+
+# Per-collection ($group accumulators, rollup field per accumulator)
+_SOURCES = [
+    (FoodLog, {
+        'calories_in': {'$sum': '$calories'},
+        'protein': {'$sum': '$protein'},
+        'carbs': {'$sum': '$carbs'},
+        'fat': {'$sum': '$fat'},
+        'food_count': {'$sum': 1},
+    }),
+    (ExerciseLog, {
+        'calories_out': {'$sum': '$calories_burned'},
+        'exercise_count': {'$sum': 1},
+    }),
+    (WaterLog, {
+        'water': {'$sum': 1},
+    }),
+]
+
+
+def rebuild(user=None, batch_size=1000):
+    """
+    Recomputes rollups from the raw logs, for one user or everyone.
+
+    Each log collection is grouped by (user, day) server-side and the
+    results are streamed back in cursor batches and applied with unordered
+    bulk upserts of `batch_size`, so memory stays flat regardless of
+    history size. Writes made while a rebuild runs can be double counted;
+    run it when log traffic is quiet.
+    Rebuilt days get a time-based version, above any count of earlier
+    writes, so ETags handed out before the rebuild stop matching.
+    Returns the number of (user, day) groups applied.
+    """
+    scope = {} if user is None else {'user': _user_id(user)}
+    version = int(time.time() * 1000)
+    DailyRollup._get_collection().delete_many(scope)
+
+    rollups = DailyRollup._get_collection()
+    applied = 0
+    for document, accumulators in _SOURCES:
+        pipeline = [
+            {'$match': dict(scope, date_posted={'$type': 'date'})},
+            {'$group': dict(
+                _id={
+                    'user': '$user',
+                    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date_posted'}},
+                },
+                **accumulators)},
+        ]
+        cursor = document._get_collection().aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        ops = []
+        for group in cursor:
+            key = group.pop('_id')
+            day = datetime.strptime(key['day'], '%Y-%m-%d')
+            ops.append(UpdateOne({'user': key['user'], 'day': day},
+                                 {'$inc': group, '$max': {'version': version}}, upsert=True))
+            if len(ops) >= batch_size:
+                rollups.bulk_write(ops, ordered=False)
+                applied += len(ops)
+                ops = []
+        if ops:
+            rollups.bulk_write(ops, ordered=False)
+            applied += len(ops)
+    return applied
+
+
+def recent_days(days=7, end=None):
+    """The last `days` dates ending today (oldest first)."""
+    end = end or date.today()
+    return [end - timedelta(days=days - 1 - i) for i in range(days)]
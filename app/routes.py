@@ -1,23 +1,40 @@
-import os
 import json
-from datetime import datetime, date, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, session, jsonify
-from werkzeug.utils import secure_filename
+from datetime import date
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, session, jsonify, Response, stream_with_context, send_from_directory
+from PIL import UnidentifiedImageError
 from flask_login import login_user, logout_user, login_required, current_user
-from app.ml.model import FoodClassifier
 from app.models import User, FoodLog, WaterLog, ExerciseLog
-from app import login_manager, oauth
+from app.summary import daily_summary, todays_food, todays_exercise, remove_latest_water
+from app import rollups, meals, pending, sync, api
+from app.jobs import QueueFull
+from app.exercises import burn, MAX_MINUTES
+from app import login_manager, oauth, classifiers, jobs, uploads, users, catalog, passwords
+from app.passwords import unusable, LEGACY_OAUTH_PASSWORD
 
 main = Blueprint('main', __name__)
 
+# Day windows offered on /stats
+STATS_RANGES = (7, 30, 90, 365)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.objects(pk=user_id).first()
+    return users.load(user_id)
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif'}
 
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+def job_status(job):
+    status = {'id': str(job.id), 'kind': job.kind, 'status': job.status}
+    if job.status == 'done':
+        status['result'] = job.result
+    elif job.status == 'failed':
+        status['error'] = job.error
+    return status
+
 # --- Google Auth ---
 @main.route('/google/login')
 def google_login():
@@ -43,13 +60,16 @@ def google_callback():
         # Create new user
         user = User(
             username=email,
-            password='google_oauth_dummy_password', # They won't use password login anyway
+            password=unusable(), # They sign in through Google only
             height=175, weight=70, age=25,
             goal_calories=2000
         )
         user.save()
         flash(f"Account created for {name}!")
+    elif user.password == LEGACY_OAUTH_PASSWORD:
+        users.update(user, password=unusable())
     
+    users.invalidate(user.pk)
     login_user(user)
     return redirect(url_for('main.dashboard'))
 
@@ -68,7 +88,7 @@ def register():
         # Create User
         new_user = User(
             username=username,
-            password=password, # In production, hash this!
+            password=passwords.hash(password),
             height=175, weight=70, age=25, # Defaults
             goal_calories=2000
         )
@@ -84,7 +104,9 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         user = User.objects(username=username).first()
-        if user and user.password == password:
+        # Unknown names still pay for a KDF, so timing doesn't reveal which accounts exist
+        if passwords.verify(user, password, users) if user else passwords.reject(password):
+            users.invalidate(user.pk)
             login_user(user)
             return redirect(url_for('main.dashboard'))
         else:
@@ -94,29 +116,13 @@ def login():
 @main.route('/stats')
 @login_required
 def stats():
-    # Get last 7 days
-    end_date = date.today()
-    start_date = end_date - timedelta(days=6)
-    
-    # Fetch logs
-    logs = FoodLog.objects(user=current_user, date_posted__gte=start_date)
-    
-    # Process Data for Chart
-    data = {}
-    # Init last 7 days with 0
-    for i in range(7):
-        day = start_date + timedelta(days=i)
-        data[day.strftime('%Y-%m-%d')] = 0
-        
-    for log in logs:
-        day_str = log.date_posted.strftime('%Y-%m-%d')
-        if day_str in data:
-            data[day_str] += log.calories
-            
-    labels = list(data.keys())
-    values = list(data.values())
-    
-    return render_template('stats.html', labels=labels, values=values, user=current_user)
+    # The page is a shell; its charts stream from /api/v1/analytics?days=
+    days = request.args.get('days', 7, type=int)
+    if days not in STATS_RANGES:
+        days = STATS_RANGES[0]
+    etag = api.make_etag(current_user, f'stats-page:{days}', {}, 'stats.html')
+    return api.conditional(etag, lambda: render_template(
+        'stats.html', days=days, ranges=STATS_RANGES, user=current_user))
 
 @main.route('/logout')
 @login_required
@@ -128,80 +134,100 @@ def logout():
 @main.route('/')
 @login_required
 def dashboard():
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    
-    # Fetch separate logs
-    todays_food = FoodLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end)
-    todays_exercise = ExerciseLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end)
-    
-    # Calculations
-    cals_eaten = sum(f.calories for f in todays_food)
-    cals_burned = sum(e.calories_burned for e in todays_exercise)
-    net_cals = cals_eaten - cals_burned
-    remaining_cals = current_user.goal_calories - net_cals
-    
-    total_protein = sum(f.protein for f in todays_food if f.protein)
-    todays_water = WaterLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end).count()
-    
-    return render_template('dashboard.html', 
-                           user=current_user,
-                           cals_eaten=cals_eaten,
-                           cals_burned=cals_burned,
-                           net_cals=net_cals,
-                           remaining=remaining_cals,
-                           protein=total_protein,
-                           water=todays_water,
-                           food_log=todays_food,
-                           exercise_log=todays_exercise)
+    # Totals from today's rollup; unchanged since the client's copy -> 304
+    today = date.today()
+    rollup = rollups.rollup_for(current_user, today)
+    etag = api.make_etag(current_user, 'dashboard', {today: rollup.version}, 'dashboard.html')
+
+    def render():
+        # Rows fetched with only the rendered fields
+        summary = daily_summary(current_user, today, rollup)
+        return render_template('dashboard.html', 
+                               user=current_user,
+                               cals_eaten=summary['cals_eaten'],
+                               cals_burned=summary['cals_burned'],
+                               net_cals=summary['net_cals'],
+                               remaining=summary['remaining'],
+                               protein=summary['protein'],
+                               water=summary['water'],
+                               food_log=todays_food(current_user, today),
+                               exercise_log=todays_exercise(current_user, today))
+    return api.conditional(etag, render)
 
 # --- Chat ---
+def coach_context(user):
+    return f"User is {user.weight}kg, Goal: {user.goal_calories}kcal. Activity: {user.activity_level}."
+
+def apply_coach_action(user, response):
+    """Runs the side effect the coach asked for (goal update or food log)."""
+    action = response.get('action')
+    action_data = response.get('data') or {}
+    
+    if action == 'update_goal':
+        if 'goal_calories' in action_data:
+            users.update(user, goal_calories=int(action_data['goal_calories']))
+            
+    elif action == 'log_food':
+        # Log the food automatically (one bulk insert when several foods were named)
+        meals.log_meal(user, action_data.get('items') or [action_data])
+
 @main.route('/chat', methods=['POST'])
 @login_required
 def chat():
     data = request.get_json()
     user_message = data.get('message')
     
-    # Build Context
-    context = f"User is {current_user.weight}kg, Goal: {current_user.goal_calories}kcal. Activity: {current_user.activity_level}."
-    
-    data_path = os.path.join(current_app.root_path, '..', 'data', 'calories.json')
-    classifier = FoodClassifier(data_path)
-    response = classifier.chat_with_coach(user_message, context)
+    classifier = classifiers.get()
+    response = classifier.chat_with_coach(user_message, coach_context(current_user))
     
     # Execute Actions
-    action = response.get('action')
-    action_data = response.get('data', {})
-    
-    if action == 'update_goal':
-        if 'goal_calories' in action_data:
-            current_user.goal_calories = int(action_data['goal_calories'])
-            current_user.save()
-            
-    elif action == 'log_food':
-        # Log the food automatically
-        new_food = FoodLog(
-            user=current_user,
-            name=action_data.get('food_name', 'Quick Add'),
-            calories=action_data.get('calories', 0),
-            protein=action_data.get('protein', 0),
-            carbs=0, fat=0 # AI might skip these for simple chat logs
-        )
-        new_food.save()
+    apply_coach_action(current_user, response)
         
     return json.dumps(response)
 
+@main.route('/chat/stream', methods=['POST'])
+@login_required
+def chat_stream():
+    """
+    Server-sent events version of /chat: `data: {"token": ...}` frames as
+    the reply is generated, then one `event: done` frame with the full
+    {reply, action, data}. The action is applied once, after the model has
+    finished and the action block parsed.
+    """
+    data = request.get_json()
+    user_message = data.get('message')
+    user = current_user._get_current_object()
+    stream = classifiers.get().stream_chat_with_coach(user_message, coach_context(user))
+    
+    def events():
+        for kind, payload in stream:
+            if kind == 'token':
+                yield f"data: {json.dumps({'token': payload})}\n\n"
+            else:
+                apply_coach_action(user, payload)
+                yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # --- Deletion Routes ---
 @main.route('/delete_food/<id>')
 @login_required
 def delete_food(id):
-    FoodLog.objects(pk=id).delete()
+    removed = FoodLog.objects(pk=id, user=current_user).modify(remove=True)
+    if removed:
+        rollups.food_changed(current_user, removed.date_posted, removed.calories,
+                             removed.protein, removed.carbs, removed.fat, sign=-1)
+        uploads.release(removed.image_file, removed.thumb_file)
     return redirect(url_for('main.dashboard'))
 
 @main.route('/delete_exercise/<id>')
 @login_required
 def delete_exercise(id):
-    ExerciseLog.objects(pk=id).delete()
+    removed = ExerciseLog.objects(pk=id, user=current_user).modify(remove=True)
+    if removed:
+        rollups.exercise_changed(current_user, removed.date_posted,
+                                 removed.calories_burned, sign=-1)
     return redirect(url_for('main.dashboard'))
 
 # --- Actions ---
@@ -211,9 +237,7 @@ def add_water():
     new_water = WaterLog(user=current_user)
     new_water.save()
     
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    count = WaterLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end).count()
+    count = rollups.water_changed(current_user, new_water.date_posted)
     print(f"Water Added. New Count: {count}")
     
     return jsonify({'success': True, 'water': count, 'goal': current_user.goal_water})
@@ -221,33 +245,112 @@ def add_water():
 @main.route('/remove_water')
 @login_required
 def remove_water():
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    latest = WaterLog.objects(user=current_user, date_posted__gte=today_start).order_by('-date_posted').first()
-    if latest:
-        latest.delete()
-    
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    count = WaterLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end).count()
+    removed = remove_latest_water(current_user)
+    if removed:
+        count = rollups.water_changed(current_user, removed['date_posted'], sign=-1)
+    else:
+        count = rollups.rollup_for(current_user).water
     print(f"Water Removed. New Count: {count}")
     
     return jsonify({'success': True, 'water': count, 'goal': current_user.goal_water})
 
+@main.route('/sync', methods=['POST'])
+@login_required
+def sync_actions():
+    """
+    Replays water, food and exercise actions queued offline (see app/sync.py).
+    Safe to retry: actions already applied are counted as duplicates.
+    """
+    data = request.get_json(silent=True) or {}
+    actions = data.get('actions')
+    if not isinstance(actions, list):
+        return jsonify({'error': 'Expected {"actions": [...]}.'}), 400
+    try:
+        result = sync.ingest(current_user, actions)
+    except sync.BatchTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    result['water'] = rollups.rollup_for(current_user).water
+    result['goal'] = current_user.goal_water
+    return jsonify(result)
+
+@main.route('/sw.js')
+def service_worker():
+    # Served from the root so the worker's scope covers the whole app
+    response = send_from_directory(current_app.static_folder, 'sw.js', max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @main.route('/manual_add', methods=['GET', 'POST'])
 @login_required
 def manual_add():
     if request.method == 'POST':
         text = request.form.get('food_text')
-        data_path = os.path.join(current_app.root_path, '..', 'data', 'calories.json')
-        classifier = FoodClassifier(data_path)
+        classifier = classifiers.get()
         result = classifier.estimate_from_text(text)
         
         if result:
-            session['temp_food'] = result
+            pending.stash(session, current_user, result)
             return redirect(url_for('main.advisor'))
         else:
             flash("Could not understand food.")
     return render_template('manual_add.html')
 
+@main.route('/log_meal', methods=['POST'])
+@login_required
+def log_meal():
+    """
+    Logs a whole meal in one go: several text items (JSON {"items": [...]}
+    or the food_text form field, e.g. "dal, 2 roti and rice") are estimated
+    in one model call and inserted with one bulk write. Meal photos
+    ("files") are analyzed together in a background job instead.
+    """
+    data = request.get_json(silent=True) or {}
+    files = [f for f in request.files.getlist('files') if f.filename and allowed_file(f.filename)]
+    
+    if files:
+        try:
+            images = [uploads.save_upload(f, current_app.config) for f in files]
+        except (UnidentifiedImageError, OSError):
+            return jsonify({'error': 'Could not read an image.'}), 400
+        try:
+            job_id = jobs.submit(current_user, 'meal', run_meal_analysis, current_user.id,
+                                 [uploads.path(i.filename) for i in images],
+                                 [i.mime_type for i in images],
+                                 images[0].filename, images[0].thumb_file,
+                                 image_file=images[0].filename, thumb_file=images[0].thumb_file)
+        except QueueFull:
+            return jsonify({'error': 'Scanner busy, try again shortly.'}), 503
+        return jsonify({'job_id': job_id, 'status_url': url_for('main.job', job_id=job_id)}), 202
+    
+    items = data.get('items') or request.form.get('food_text') or []
+    if isinstance(items, list):
+        if not all(isinstance(item, str) and item.strip() for item in items):
+            return jsonify({'error': 'Every item must be a non-empty string.'}), 400
+    elif not isinstance(items, str):
+        return jsonify({'error': 'items must be a list of strings.'}), 400
+    results = classifiers.get().estimate_meal(items)
+    logs = meals.log_meal(current_user, results)
+    
+    if wants_json() or request.is_json:
+        return jsonify({
+            'logged': [{'name': l.name, 'calories': l.calories} for l in logs],
+            'skipped': len(results) - len(logs),
+        })
+    if logs:
+        flash(f"Logged {len(logs)} items: {sum(l.calories for l in logs)} kcal.")
+    else:
+        flash("Could not understand food.")
+    return redirect(url_for('main.dashboard'))
+
+def run_meal_analysis(user_id, filepaths, mime_types, image_file=None, thumb_file=None):
+    """Background job for meal photos: identifies every dish and logs them all."""
+    items = classifiers.get().predict_meal(filepaths, mime_types)
+    if not items:
+        return {'items': [], 'logged': 0}
+    user = User.objects(pk=user_id).first()
+    logs = meals.log_meal(user, items, image_file, thumb_file)
+    return {'items': items, 'logged': len(logs)}
+
 @main.route('/predict', methods=['POST'])
 @login_required
 def predict():
@@ -257,22 +360,55 @@ def predict():
     if file.filename == '' or not allowed_file(file.filename):
         return redirect(url_for('main.dashboard'))
         
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    try:
+        image = uploads.save_upload(file, current_app.config)
+    except (UnidentifiedImageError, OSError):
+        flash("Could not read that image.")
+        return redirect(url_for('main.dashboard'))
+    filepath = uploads.path(image.filename)
     
-    data_path = os.path.join(current_app.root_path, '..', 'data', 'calories.json')
-    classifier = FoodClassifier(data_path)
-    result = classifier.predict(filepath)
+    # Analysis runs in the background; advisor picks up the result
+    try:
+        job_id = jobs.submit(current_user, 'food', classifiers.get().predict, filepath, image.mime_type,
+                             image_file=image.filename, thumb_file=image.thumb_file)
+    except QueueFull:
+        if wants_json():
+            return jsonify({'error': 'Scanner busy, try again shortly.'}), 503
+        flash("Scanner busy, try again in a moment.")
+        return redirect(url_for('main.dashboard'))
     
-    result['image_file'] = filename
-    session['temp_food'] = result
+    session['food_job'] = job_id
+    if wants_json():
+        return jsonify({'job_id': job_id, 'status_url': url_for('main.job', job_id=job_id)}), 202
     return redirect(url_for('main.advisor'))
 
+@main.route('/jobs/<job_id>')
+@login_required
+def job(job_id):
+    found = jobs.get(job_id, current_user)
+    if not found:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job_status(found))
+
 @main.route('/advisor', methods=['GET', 'POST'])
 @login_required
 def advisor():
-    food_data = session.get('temp_food')
+    # Pick up a finished photo analysis
+    job_id = session.get('food_job')
+    if job_id:
+        found = jobs.get(job_id, current_user)
+        if found and found.status in ('queued', 'running'):
+            return render_template('analyzing.html', job_id=job_id)
+        session.pop('food_job', None)
+        if found and found.status == 'done':
+            result = found.result
+            result['image_file'] = found.image_file
+            result['thumb_file'] = found.thumb_file
+            pending.stash(session, current_user, result)
+        else:
+            flash("Could not analyze that photo.")
+
+    food_data = pending.fetch(session, current_user)
     if not food_data:
         return redirect(url_for('main.dashboard'))
         
@@ -293,27 +429,23 @@ def advisor():
                 user=current_user,
                 name=food_data['dish'],
                 calories=c, protein=p, carbs=cb, fat=f,
-                image_file=food_data.get('image_file')
+                image_file=food_data.get('image_file'),
+                thumb_file=food_data.get('thumb_file')
             )
             new_food.save()
-            session.pop('temp_food', None)
+            rollups.food_changed(current_user, new_food.date_posted, new_food.calories,
+                                 new_food.protein, new_food.carbs, new_food.fat)
+            pending.discard(session, current_user)
             return redirect(url_for('main.dashboard'))
         else:
-            session.pop('temp_food', None)
+            pending.discard(session, current_user)
             return redirect(url_for('main.dashboard'))
 
     # Precise Calculation (Matches Dashboard)
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    
-    todays_food = FoodLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end)
-    todays_exercise = ExerciseLog.objects(user=current_user, date_posted__gte=today_start, date_posted__lte=today_end)
-    
-    cals_eaten = sum(f.calories for f in todays_food)
-    cals_burned = sum(e.calories_burned for e in todays_exercise)
+    summary = daily_summary(current_user)
     
     # Remaining = Goal - (Eaten - Burned)
-    remaining_before = current_user.goal_calories - (cals_eaten - cals_burned)
+    remaining_before = summary['remaining']
     
     # Check safety
     this_food_cals = food_data['nutrition'].get('calories', 0)
@@ -326,28 +458,22 @@ def advisor():
 def workout():
     if request.method == 'POST':
         activity = request.form.get('activity')
-        duration = int(request.form.get('duration'))
-        burned = int(request.form.get('calories')) 
-        
+        duration = min(max(int(request.form.get('duration')), 1), MAX_MINUTES)
+        met = catalog.met_for(activity, request.form.get('met'))
+        burned = int(burn(met, duration, current_user.weight))
+
         log = ExerciseLog(
             user=current_user,
             activity_name=activity,
             duration_minutes=duration,
-            calories_burned=burned
+            calories_burned=burned,
+            met=met
         )
         log.save()
+        rollups.exercise_changed(current_user, log.date_posted, log.calories_burned)
         return redirect(url_for('main.dashboard'))
 
-    # Load Gym Data
-    gym_data = {}
-    try:
-        data_path = os.path.join(current_app.root_path, '..', 'data', 'gym_exercises.json')
-        with open(data_path, 'r') as f:
-            gym_data = json.load(f)
-    except:
-        pass
-        
-    return render_template('workout.html', gym_data=gym_data, user_weight=current_user.weight)
+    return render_template('workout.html', gym_data=catalog.entries, user_weight=current_user.weight)
 
 @main.route('/profile', methods=['GET', 'POST'])
 @login_required
@@ -357,49 +483,16 @@ def profile():
         if 'file' in request.files and request.files['file'].filename != '':
             try:
                 file = request.files['file']
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
+                image = uploads.save_upload(file, current_app.config)
+                filepath = uploads.path(image.filename)
                 
-                # AI Analysis
-                data_path = os.path.join(current_app.root_path, '..', 'data', 'calories.json')
-                classifier = FoodClassifier(data_path)
-                stats = classifier.analyze_body(filepath)
-                
-                if stats:
-                    # Auto-Update User Stats
-                    # Ensure we cast to float/int to avoid errors
-                    try:
-                        current_user.gender = stats.get('gender', 'Male')
-                        current_user.height = float(stats.get('height', 175))
-                        current_user.weight = float(stats.get('weight', 70))
-                        
-                        # Auto-Recalculate Goal (Mifflin-St Jeor)
-                        age = current_user.age if current_user.age else 25
-                        activity = current_user.activity_level if current_user.activity_level else 'Moderate'
-                        
-                        bmr = (10 * current_user.weight) + (6.25 * current_user.height) - (5 * age)
-                        if current_user.gender == 'Male':
-                            bmr += 5
-                        else:
-                            bmr -= 161
-                        
-                        multipliers = {'Sedentary': 1.2, 'Light': 1.375, 'Moderate': 1.55, 'Active': 1.725}
-                        tdee = int(bmr * multipliers.get(activity, 1.55))
-                        
-                        # Auto-Calculate Water
-                        water_glasses = int((current_user.weight * 35) / 250)
-                        
-                        current_user.goal_calories = tdee
-                        current_user.goal_water = water_glasses
-                        current_user.save() # SAVE TO DB HERE
-                        
-                        flash(f"AI Updated: {current_user.height}cm, {current_user.weight}kg. Goal: {tdee} kcal.")
-                    except Exception as db_err:
-                        print(f"DB Update Error: {db_err}")
-                        flash("AI Analysis worked, but failed to save stats.")
-                else:
-                    flash("AI could not detect a person clearly. Please try a full-body shot.")
+                # AI Analysis runs in the background; the profile page polls for it
+                try:
+                    session['body_job'] = jobs.submit(current_user, 'body', run_body_analysis,
+                                                      current_user.id, filepath, image.mime_type,
+                                                      image_file=image.filename)
+                except QueueFull:
+                    flash("Scanner busy, try again in a moment.")
                 
                 return redirect(url_for('main.profile'))
                 
@@ -438,17 +531,76 @@ def profile():
             # Water Goal: 35ml per kg
             water_glasses = int((weight * 35) / 250)
             
-            current_user.weight = weight
-            current_user.height = height
-            current_user.age = age
-            current_user.gender = gender
-            current_user.activity_level = activity
-            current_user.goal_calories = tdee 
-            current_user.goal_water = water_glasses
-            current_user.save()
+            weight_changed = weight != current_user.weight
+            users.update(current_user,
+                         weight=weight, height=height, age=age, gender=gender,
+                         activity_level=activity, goal_calories=tdee, goal_water=water_glasses)
+            if weight_changed:
+                catalog.recompute_burns(current_user, weight)
             flash(f'Updated! Calorie Goal: {tdee}, Water Goal: {water_glasses}')
             
         except Exception as e:
             flash(f'Error updating stats: {e}')
             
-    return render_template('profile.html', user=current_user)
+    # Report a finished bio-scan
+    pending_job = None
+    job_id = session.get('body_job')
+    if job_id:
+        found = jobs.get(job_id, current_user)
+        if found and found.status in ('queued', 'running'):
+            pending_job = job_id
+        else:
+            session.pop('body_job', None)
+            if found and found.status == 'done':
+                flash(found.result['message'])
+                users.invalidate(current_user.pk)
+                current_user.reload()
+            else:
+                flash("Analysis Error: the bio-scan did not finish.")
+            
+    return render_template('profile.html', user=current_user, pending_job=pending_job)
+
+def run_body_analysis(user_id, filepath, mime_type=None):
+    """
+    Background job for the profile bio-scan: estimates stats from the photo
+    and updates the user's stats and goals. Returns {'message', 'stats'}.
+    """
+    stats = classifiers.get().analyze_body(filepath, mime_type)
+    if not stats:
+        return {'message': "AI could not detect a person clearly. Please try a full-body shot.", 'stats': None}
+
+    user = User.objects(pk=user_id).first()
+    # Auto-Update User Stats
+    # Ensure we cast to float/int to avoid errors
+    try:
+        gender = stats.get('gender', 'Male')
+        height = float(stats.get('height', 175))
+        weight = float(stats.get('weight', 70))
+        
+        # Auto-Recalculate Goal (Mifflin-St Jeor)
+        age = user.age if user.age else 25
+        activity = user.activity_level if user.activity_level else 'Moderate'
+        
+        bmr = (10 * weight) + (6.25 * height) - (5 * age)
+        if gender == 'Male':
+            bmr += 5
+        else:
+            bmr -= 161
+        
+        multipliers = {'Sedentary': 1.2, 'Light': 1.375, 'Moderate': 1.55, 'Active': 1.725}
+        tdee = int(bmr * multipliers.get(activity, 1.55))
+        
+        # Auto-Calculate Water
+        water_glasses = int((weight * 35) / 250)
+        
+        # SAVE TO DB HERE (only the fields the scan changed)
+        weight_changed = weight != user.weight
+        users.update(user, gender=gender, height=height, weight=weight,
+                     goal_calories=tdee, goal_water=water_glasses)
+        if weight_changed:
+            catalog.recompute_burns(user, weight)
+        
+        return {'message': f"AI Updated: {user.height}cm, {user.weight}kg. Goal: {tdee} kcal.", 'stats': stats}
+    except Exception as db_err:
+        print(f"DB Update Error: {db_err}")
+        return {'message': "AI Analysis worked, but failed to save stats.", 'stats': stats}
@@ -0,0 +1,120 @@
+// Offline action queue: water, food and exercise logs wait in IndexedDB
+// and are replayed in batches through POST /sync (see app/sync.py).
+// Loaded by pages (<script>) and by the service worker (importScripts).
+(function (scope) {
+    const DB_NAME = 'titan-offline';
+    const STORE = 'actions';
+    const SYNC_TAG = 'titan-sync';
+    const MAX_BATCH = 500; // app.sync.MAX_ACTIONS
+
+    const inFlight = new Set();
+    let flushing = null;
+
+    function openDb() {
+        return new Promise((resolve, reject) => {
+            const req = indexedDB.open(DB_NAME, 1);
+            req.onupgradeneeded = () => req.result.createObjectStore(STORE, { keyPath: 'id' });
+            req.onsuccess = () => resolve(req.result);
+            req.onerror = () => reject(req.error);
+        });
+    }
+
+    async function withStore(mode, fn) {
+        const db = await openDb();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(STORE, mode);
+            const req = fn(tx.objectStore(STORE));
+            tx.oncomplete = () => { db.close(); resolve(req ? req.result : undefined); };
+            tx.onerror = () => { db.close(); reject(tx.error); };
+        });
+    }
+
+    function newId() {
+        if (scope.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }
+
+    // Queues {type: 'water'|'food'|'exercise', ...fields}; the id makes replays idempotent
+    async function enqueue(action) {
+        const item = Object.assign({ id: newId(), at: new Date().toISOString() }, action);
+        await withStore('readwrite', store => store.put(item));
+        return item;
+    }
+
+    function all() {
+        return withStore('readonly', store => store.getAll());
+    }
+
+    function remove(ids) {
+        return withStore('readwrite', store => { ids.forEach(id => store.delete(id)); });
+    }
+
+    // Takes back the newest queued action of `type` that is not being sent; true if one was removed
+    async function dropLast(type) {
+        const items = (await all())
+            .filter(a => a.type === type && !inFlight.has(a.id))
+            .sort((a, b) => (a.at < b.at ? -1 : 1));
+        if (!items.length) return false;
+        await remove([items[items.length - 1].id]);
+        return true;
+    }
+
+    async function sendAll() {
+        let result = null;
+        for (;;) {
+            const items = (await all()).slice(0, MAX_BATCH);
+            if (!items.length) return result;
+            items.forEach(a => inFlight.add(a.id));
+            try {
+                const res = await fetch('/sync', {
+                    method: 'POST',
+                    credentials: 'same-origin',
+                    headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+                    body: JSON.stringify({ actions: items }),
+                });
+                // A redirect means the session expired: keep the queue for after login
+                const type = res.headers.get('Content-Type') || '';
+                if (!res.ok || res.redirected || !type.includes('application/json')) {
+                    throw new Error(`sync failed (${res.status})`);
+                }
+                result = await res.json();
+                await remove(items.map(a => a.id));
+            } finally {
+                items.forEach(a => inFlight.delete(a.id));
+            }
+            if (items.length < MAX_BATCH) return result;
+        }
+    }
+
+    // Sends everything queued; concurrent callers share one run. Resolves to the last /sync reply.
+    function flush() {
+        if (!flushing) flushing = sendAll().finally(() => { flushing = null; });
+        return flushing;
+    }
+
+    // Asks the service worker to flush once the device is back online
+    async function requestSync() {
+        if (!('serviceWorker' in navigator)) return;
+        const reg = await navigator.serviceWorker.ready;
+        if (reg.sync) await reg.sync.register(SYNC_TAG);
+    }
+
+    // Flushes now, falling back to background sync
+    async function flushOrDefer() {
+        try {
+            return await flush();
+        } catch (err) {
+            await requestSync().catch(() => {});
+            return null;
+        }
+    }
+
+    scope.TitanQueue = { SYNC_TAG, enqueue, all, dropLast, flush, flushOrDefer, requestSync };
+
+    if (scope.document) {
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('/sw.js').catch(err => console.error('Service worker:', err));
+        }
+        scope.addEventListener('online', () => flushOrDefer());
+    }
+})(self);
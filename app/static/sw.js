@@ -1,9 +1,90 @@
+// Bump VERSION whenever a cached asset changes: caches of other versions are deleted on activate
+const VERSION = 'v2';
+const STATIC_CACHE = `titan-static-${VERSION}`;
+const DATA_CACHE = `titan-data-${VERSION}`;
+
+const STATIC_ASSETS = [
+    '/static/css/maniac.css',
+    '/static/css/style.css',
+    '/static/js/queue.js',
+    '/static/manifest.json',
+];
+// Third-party CSS/JS/fonts the pages link to
+const CDN_HOSTS = ['cdn.jsdelivr.net', 'fonts.googleapis.com', 'fonts.gstatic.com'];
+// Pages and read API answered from cache at once and refreshed in the background
+const DATA_PAGES = ['/', '/stats', '/workout'];
+const DATA_API = '/api/v1/';
+// Requests after which cached pages are out of date
+const MUTATING = /^\/(add_water|remove_water|delete_food|delete_exercise|login|logout|google)/;
+
+importScripts('/static/js/queue.js');
+
 self.addEventListener('install', (event) => {
-  console.log('Service Worker installing.');
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(STATIC_ASSETS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    const current = [STATIC_CACHE, DATA_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(k => !current.includes(k)).map(k => caches.delete(k))))
+            .then(() => self.clients.claim())
+    );
 });
 
 self.addEventListener('fetch', (event) => {
-  // Basic pass-through fetch for now. 
-  // In future, we can cache assets here for offline use.
-  event.respondWith(fetch(event.request));
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin === self.location.origin) {
+        if (request.method !== 'GET' || MUTATING.test(url.pathname)) {
+            event.waitUntil(caches.delete(DATA_CACHE));
+            return;
+        }
+        if (STATIC_ASSETS.includes(url.pathname)) {
+            event.respondWith(cacheFirst(request, STATIC_CACHE));
+        } else if (DATA_PAGES.includes(url.pathname) || url.pathname.startsWith(DATA_API)) {
+            event.respondWith(staleWhileRevalidate(event, DATA_CACHE));
+        }
+    } else if (request.method === 'GET' && CDN_HOSTS.includes(url.hostname)) {
+        event.respondWith(cacheFirst(request, STATIC_CACHE));
+    }
+});
+
+self.addEventListener('sync', (event) => {
+    if (event.tag === TitanQueue.SYNC_TAG) {
+        // A rejection makes the browser retry later
+        event.waitUntil(TitanQueue.flush().then(() => caches.delete(DATA_CACHE)));
+    }
 });
+
+async function cacheFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request, { ignoreSearch: true });
+    if (cached) return cached;
+    const response = await fetch(request);
+    // Opaque (no-cors CDN) responses are cached as-is
+    if (response.ok || response.type === 'opaque') cache.put(request, response.clone());
+    return response;
+}
+
+async function staleWhileRevalidate(event, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request);
+    const network = fetch(event.request).then(response => {
+        // Redirects (e.g. to /login) are never cached
+        if (response.ok && !response.redirected && response.type === 'basic') {
+            cache.put(event.request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+    }
+    return network;
+}
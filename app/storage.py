@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+from app.images import preprocess_from_config
+
+StoredImage = namedtuple('StoredImage', 'filename mime_type thumb_file')
+
+# Files stored or re-uploaded this recently are never released: the job or
+# pending analysis that will reference them may not be saved yet
+RELEASE_GRACE = 600
+
+
+def _referencing_fields():
+    """(document, fields) that can name a stored file: logs, jobs and pending analyses."""
+    from app.models import FoodLog, AnalysisJob, PendingAnalysis
+    return [(FoodLog, ('image_file', 'thumb_file')),
+            (AnalysisJob, ('image_file', 'thumb_file')),
+            (PendingAnalysis, ('result.image_file', 'result.thumb_file'))]
+
+
+class ImageStore:
+    """
+    Content-addressed upload storage under UPLOAD_FOLDER.
+
+    Files are named by the sha256 of their bytes and sharded two levels
+    deep (`ab/cd/abcd...jpg`), so identical uploads are stored once and no
+    directory grows without bound. Names are relative to the uploads
+    folder, which is what FoodLog.image_file / thumb_file hold.
+    """
+
+    def __init__(self, app=None):
+        self.root = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config['UPLOAD_FOLDER']
+        app.extensions['image_store'] = self
+
+    def path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def put(self, data, ext):
+        """Stores `data` (deduplicated) and returns its name."""
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+        path = self.path(name)
+        if os.path.exists(path):
+            # Re-upload of a known file: restart its retention clock
+            os.utime(path)
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+        return name
+
+    def save_upload(self, file, config):
+        """Preprocesses an uploaded FileStorage and stores the image and its thumbnail."""
+        image = preprocess_from_config(file, config)
+        return StoredImage(self.put(image.data, image.ext), image.mime_type,
+                           self.put(image.thumb_data, image.ext))
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+            return True
+        except OSError:
+            return False
+
+    def iter_files(self):
+        """Yields (name, mtime) for every stored file, including legacy flat uploads."""
+        for dirpath, _dirs, files in os.walk(self.root):
+            for filename in files:
+                if filename.startswith('.') or filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                yield name, os.path.getmtime(path)
+
+    def reference_counts(self):
+        """Counter of references per stored name from logs, jobs and pending analyses."""
+        counts = Counter()
+        for document, fields in _referencing_fields():
+            collection = document._get_collection()
+            for field in fields:
+                pipeline = [
+                    {'$match': {field: {'$type': 'string'}}},
+                    {'$group': {'_id': f'${field}', 'n': {'$sum': 1}}},
+                ]
+                for row in collection.aggregate(pipeline, allowDiskUse=True):
+                    counts[row['_id']] += row['n']
+        return counts
+
+    def is_referenced(self, name):
+        # Deduplicated files can be shared by other logs, users' jobs and pending analyses
+        return any(
+            document._get_collection().find_one({'$or': [{field: name} for field in fields]},
+                                                {'_id': 1}) is not None
+            for document, fields in _referencing_fields())
+
+    def release(self, *names):
+        """
+        Deletes the named files once nothing references them and they were
+        not stored in the last RELEASE_GRACE seconds; gc() sweeps the rest.
+        """
+        cutoff = time.time() - RELEASE_GRACE
+        for name in filter(None, names):
+            try:
+                if os.path.getmtime(self.path(name)) > cutoff:
+                    continue
+            except OSError:
+                continue
+            if not self.is_referenced(name):
+                self.delete(name)
+
+    def gc(self, grace_seconds=24 * 3600, dry_run=False):
+        """
+        Removes files nothing references and that are older than
+        `grace_seconds`, such as bio-scan photos and scans the user
+        discarded. The grace period covers uploads whose job is not saved
+        yet. Returns the removed names.
+        """
+        referenced = self.reference_counts()
+        cutoff = time.time() - grace_seconds
+        removed = []
+        for name, mtime in self.iter_files():
+            if referenced[name] or mtime > cutoff:
+                continue
+            if dry_run or self.delete(name):
+                removed.append(name)
+        return removed
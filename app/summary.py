@@ -0,0 +1,62 @@
+"""
+Daily summary service for the dashboard and advisor.
+
+Totals come from the per-day rollup maintained on every write, so the cost
+stays flat however many entries a user logs in a day. Log rows for the
+templates are fetched separately with only the fields they render.
+"""
+from datetime import datetime, date
+
+from app.models import FoodLog, WaterLog, ExerciseLog
+from app.rollups import rollup_for
+
+
+def day_bounds(day=None):
+    day = day or date.today()
+    return datetime.combine(day, datetime.min.time()), datetime.combine(day, datetime.max.time())
+
+
+def daily_totals(user, day=None, rollup=None):
+    """
+    Returns {'cals_eaten', 'protein', 'cals_burned', 'water'} for one day,
+    read from the user's DailyRollup (a single indexed lookup) unless the
+    caller already has it.
+    """
+    if rollup is None:
+        rollup = rollup_for(user, day)
+    return {
+        'cals_eaten': rollup.calories_in,
+        'protein': rollup.protein,
+        'cals_burned': rollup.calories_out,
+        'water': rollup.water,
+    }
+
+
+def daily_summary(user, day=None, rollup=None):
+    """Totals plus the derived numbers the dashboard shows."""
+    totals = daily_totals(user, day, rollup)
+    net_cals = totals['cals_eaten'] - totals['cals_burned']
+    totals['net_cals'] = net_cals
+    totals['remaining'] = user.goal_calories - net_cals
+    return totals
+
+
+def todays_food(user, day=None):
+    start, end = day_bounds(day)
+    return FoodLog.objects(user=user, date_posted__gte=start, date_posted__lte=end) \
+        .only('id', 'name', 'calories', 'image_file', 'thumb_file')
+
+
+def todays_exercise(user, day=None):
+    start, end = day_bounds(day)
+    return ExerciseLog.objects(user=user, date_posted__gte=start, date_posted__lte=end) \
+        .only('id', 'activity_name', 'duration_minutes', 'calories_burned')
+
+
+def remove_latest_water(user, day=None):
+    """Deletes the most recent glass of the day in one round trip (find-and-delete)."""
+    start, end = day_bounds(day)
+    return WaterLog._get_collection().find_one_and_delete(
+        {'user': user.id, 'date_posted': {'$gte': start, '$lte': end}},
+        sort=[('date_posted', -1)],
+        projection={'_id': 1, 'date_posted': 1})
@@ -0,0 +1,155 @@
+"""
+Batch ingest for actions the PWA queued while offline.
+
+The service worker replays its IndexedDB queue as one POST /sync with
+{"actions": [...]}. Each action carries a client-generated `id`, stored
+as the log's client_id, so a batch that is replayed after a lost response
+inserts nothing twice: ids already stored are skipped with one $in lookup
+per log type, and the unique client_id index catches a replay racing the
+original. Each log type is written with one unordered insert_many:
+duplicates fail individually while the rest still land, and only the rows
+that were actually inserted move the day rollups.
+
+    {"id": "<uuid>", "type": "water", "at": "2026-10-17T08:15:00Z"}
+    {"id": "<uuid>", "type": "food", "at": ..., "name": "Idli", "calories": 78,
+     "protein": 2, "carbs": 16, "fat": 0.2}
+    {"id": "<uuid>", "type": "exercise", "at": ..., "activity": "Indoor RUN",
+     "duration": 20, "met": 8}
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from mongoengine import ValidationError
+
+from app.models import FoodLog, WaterLog, ExerciseLog
+from app.exercises import burn, MAX_MINUTES
+from app.transfer import insert_unordered, _float, _int
+from app import rollups, catalog
+
+MAX_ACTIONS = 500
+# Queued actions older than this are dropped rather than back-filled
+MAX_AGE = timedelta(days=7)
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+def _number(value, coerce=_float):
+    """`coerce` (transfer's finite / int64 checks) of a queued field; 0 if it was left out."""
+    if value is None or value == '':
+        return coerce(0)
+    return coerce(value)
+
+
+def _when(value, now):
+    """Local naive datetime of an ISO timestamp, clamped to now; None if unusable."""
+    if not value:
+        return now
+    try:
+        when = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    if when < now - MAX_AGE:
+        return None
+    return min(when, now)
+
+
+def _document(user, action, client_id, when):
+    kind = action.get('type')
+    if kind == 'water':
+        return WaterLog(user=user, date_posted=when, client_id=client_id)
+    if kind == 'food':
+        return FoodLog(user=user, name=str(action.get('name') or 'Quick Add')[:100],
+                       calories=_number(action.get('calories'), _int),
+                       protein=_number(action.get('protein')),
+                       carbs=_number(action.get('carbs')),
+                       fat=_number(action.get('fat')),
+                       date_posted=when, client_id=client_id)
+    if kind == 'exercise':
+        activity = str(action.get('activity') or 'Workout')[:100]
+        duration = min(max(_number(action.get('duration'), _int), 1), MAX_MINUTES)
+        met = catalog.met_for(activity, action.get('met'))
+        return ExerciseLog(user=user, activity_name=activity, duration_minutes=duration,
+                           calories_burned=int(burn(met, duration, user.weight)), met=met,
+                           date_posted=when, client_id=client_id)
+    return None
+
+
+def _insert(document, logs):
+    """
+    Unordered insert_many of `logs`; returns the ones that were new.
+    client_ids already stored are looked up first, so a replay is caught
+    even where the unique index hasn't been built yet.
+    """
+    existing = {doc['client_id'] for doc in document._get_collection().find(
+        {'client_id': {'$in': [log.client_id for log in logs]}}, {'client_id': 1})}
+    logs = [log for log in logs if log.client_id not in existing]
+    if not logs:
+        return []
+    duplicates = insert_unordered(document, [log.to_mongo() for log in logs])
+    return [log for i, log in enumerate(logs) if i not in duplicates]
+
+
+def _apply_rollups(user, document, logs):
+    by_day = defaultdict(list)
+    for log in logs:
+        by_day[rollups.day_of(log.date_posted)].append(log)
+    for day, day_logs in by_day.items():
+        if document is WaterLog:
+            rollups.water_changed(user, day, count=len(day_logs))
+        elif document is FoodLog:
+            rollups.food_changed(user, day,
+                                 calories=sum(l.calories for l in day_logs),
+                                 protein=sum(l.protein for l in day_logs),
+                                 carbs=sum(l.carbs for l in day_logs),
+                                 fat=sum(l.fat for l in day_logs),
+                                 count=len(day_logs))
+        else:
+            rollups.exercise_changed(user, day, sum(l.calories_burned for l in day_logs),
+                                     count=len(day_logs))
+
+
+def ingest(user, actions):
+    """
+    Applies a queued batch for `user`. Returns {'applied', 'duplicates',
+    'rejected'} where rejected lists the ids of malformed or stale actions,
+    including ones with non-finite or out-of-range numbers (they will
+    never apply, so the client should drop them too).
+    """
+    if len(actions) > MAX_ACTIONS:
+        raise BatchTooLarge(f"At most {MAX_ACTIONS} actions per batch.")
+    now = datetime.now()
+    batches = defaultdict(list)
+    seen, rejected = set(), []
+    duplicates = 0
+    for action in actions:
+        if not isinstance(action, dict) or not action.get('id'):
+            continue
+        client_id = str(action['id'])[:64]
+        if client_id in seen:
+            duplicates += 1
+            continue
+        seen.add(client_id)
+        when = _when(action.get('at'), now)
+        try:
+            log = _document(user, action, client_id, when) if when else None
+            if log is None:
+                raise ValidationError('unknown type or timestamp')
+            log.validate()
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            # Bad numbers included: one broken action must not wedge the client's queue
+            rejected.append(client_id)
+            continue
+        batches[type(log)].append(log)
+
+    applied = 0
+    for document, logs in batches.items():
+        inserted = _insert(document, logs)
+        duplicates += len(logs) - len(inserted)
+        applied += len(inserted)
+        if inserted:
+            _apply_rollups(user, document, inserted)
+    return {'applied': applied, 'duplicates': duplicates, 'rejected': rejected}
@@ -0,0 +1,280 @@
+"""
+Bulk export and import of a user's food, water and exercise logs.
+
+Export walks each log collection with a batched cursor and encodes rows
+into NDJSON (one object per line, with a "type" key) or CSV (one column
+set shared by all types), buffered into ~64 KB chunks and gzipped on the
+fly, so memory stays flat however long the history is.
+
+Import reads the same formats (gzipped or not) line by line, validates
+and coerces every row by hand rather than through mongoengine documents,
+and writes chunks with unordered insert_many. Rows keep their exported
+id, so re-importing a file skips what is already there; duplicates and
+invalid rows are counted rather than aborting the run. Day rollups are
+moved after each chunk, one $inc per day it touches, for inserted rows only.
+"""
+import csv
+import gzip
+import io
+import json
+import math
+import zlib
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+
+from app.models import FoodLog, WaterLog, ExerciseLog
+from app import rollups
+
+FORMATS = ('ndjson', 'csv')
+BATCH_SIZE = 1000
+CHUNK_SIZE = 1000
+FLUSH_BYTES = 64 * 1024
+MAX_ERRORS = 20
+DUPLICATE_KEY = 11000
+# BSON integers are 64-bit
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _text(max_length):
+    def coerce(value):
+        value = str(value).strip()
+        if not value:
+            raise ValueError('empty')
+        return value[:max_length]
+    return coerce
+
+
+def _float(value):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError('not finite')
+    return value
+
+
+def _int(value):
+    value = int(_float(value))
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError('out of range')
+    return value
+
+
+# Per type: (document, [(field, coerce, required)]) in column order
+SCHEMAS = {
+    'food': (FoodLog, [
+        ('name', _text(100), True),
+        ('calories', _int, True),
+        ('protein', _float, False),
+        ('carbs', _float, False),
+        ('fat', _float, False),
+    ]),
+    'water': (WaterLog, [
+        ('amount', _int, False),
+    ]),
+    'exercise': (ExerciseLog, [
+        ('activity_name', _text(100), True),
+        ('duration_minutes', _int, True),
+        ('calories_burned', _int, False),
+        ('met', _float, False),
+    ]),
+}
+KINDS = tuple(SCHEMAS)
+
+# CSV header: one column set for every type, blank where a field does not apply
+COLUMNS = ['type', 'id', 'date_posted'] + list(dict.fromkeys(
+    name for _, fields in SCHEMAS.values() for name, _, _ in fields))
+
+
+def format_for(filename, default='ndjson'):
+    """'csv' or 'ndjson' from a file name such as logs.csv.gz."""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    for fmt in FORMATS:
+        if name.endswith('.' + fmt) or (fmt == 'ndjson' and name.endswith('.jsonl')):
+            return fmt
+    return default
+
+
+# --- Export ---
+
+def iter_rows(user, kinds=KINDS, batch_size=BATCH_SIZE):
+    """Yields every log of `user` as a flat dict, oldest first per type."""
+    for kind in kinds:
+        document, fields = SCHEMAS[kind]
+        projection = dict.fromkeys(['date_posted'] + [name for name, _, _ in fields], 1)
+        cursor = document._get_collection() \
+            .find({'user': user.id}, projection, batch_size=batch_size) \
+            .sort('date_posted', 1)
+        for raw in cursor:
+            when = raw.get('date_posted')
+            row = {'type': kind, 'id': str(raw['_id']),
+                   'date_posted': when.isoformat() if when else None}
+            for name, _, _ in fields:
+                row[name] = raw.get(name)
+            yield row
+
+
+def encode(rows, fmt='ndjson'):
+    """Yields text chunks of about FLUSH_BYTES holding `rows` as NDJSON or CSV."""
+    buf = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buf, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            buf.write(json.dumps(row, separators=(',', ':')))
+            buf.write('\n')
+    for row in rows:
+        write(row)
+        if buf.tell() >= FLUSH_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzips a stream of text chunks into a stream of bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# --- Import ---
+
+def open_text(binary):
+    """Text view of a binary file object, gunzipping when it starts with the gzip magic."""
+    head = binary.read(2)
+    binary.seek(0)
+    if head == b'\x1f\x8b':
+        binary = gzip.GzipFile(fileobj=binary, mode='rb')
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+def read_rows(text, fmt='ndjson'):
+    """Yields raw rows: dicts for CSV, unparsed lines for NDJSON (parsed per row on import)."""
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    else:
+        for line in text:
+            if line.strip():
+                yield line
+
+
+def _parse_datetime(value):
+    if not value:
+        raise ValueError('missing date_posted')
+    when = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+def _parse(user_id, row, keep_ids):
+    """(kind, raw document) for one row; ValueError says what is wrong."""
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError('not an object')
+    kind = row.get('type')
+    if kind not in SCHEMAS:
+        raise ValueError(f'unknown type {kind!r}')
+    doc = {'user': user_id, 'date_posted': _parse_datetime(row.get('date_posted'))}
+    if keep_ids and row.get('id'):
+        try:
+            doc['_id'] = ObjectId(row['id'])
+        except (InvalidId, TypeError):
+            raise ValueError(f"bad id {row['id']!r}")
+    for name, coerce, required in SCHEMAS[kind][1]:
+        value = row.get(name)
+        if value is None or value == '':
+            if required:
+                raise ValueError(f'missing {name}')
+            continue
+        try:
+            doc[name] = coerce(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f'bad {name} {value!r}')
+    return kind, doc
+
+
+def insert_unordered(document, docs):
+    """
+    insert_many(ordered=False) of raw `docs`. Duplicate keys fail one row
+    each while the rest are written; returns the indexes of those rows.
+    Any other write error is raised.
+    """
+    try:
+        document._get_collection().insert_many(docs, ordered=False)
+        return set()
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != DUPLICATE_KEY for err in errors):
+            raise
+        return {err['index'] for err in errors}
+
+
+# Rollup field each imported field adds to, per type; every row also adds one to *_count
+_ROLLUP_FIELDS = {
+    'food': ({'calories': 'calories_in', 'protein': 'protein', 'carbs': 'carbs', 'fat': 'fat'},
+             'food_count'),
+    'water': ({}, 'water'),
+    'exercise': ({'calories_burned': 'calories_out'}, 'exercise_count'),
+}
+
+
+def _tally(totals, kind, docs):
+    fields, counter = _ROLLUP_FIELDS[kind]
+    for doc in docs:
+        day = totals[rollups.day_of(doc['date_posted'])]
+        day[counter] += 1
+        for field, target in fields.items():
+            day[target] += doc.get(field, 0)
+
+
+def import_rows(user, rows, chunk_size=CHUNK_SIZE, keep_ids=True):
+    """
+    Validates and inserts `rows` (from read_rows) for `user` in chunks.
+    Returns {'inserted', 'duplicates', 'rejected', 'errors'}, errors being
+    the first MAX_ERRORS row problems.
+    """
+    result = {'inserted': 0, 'duplicates': 0, 'rejected': 0, 'errors': []}
+    pending = {kind: [] for kind in SCHEMAS}
+
+    def flush(kind):
+        docs, pending[kind] = pending[kind], []
+        duplicates = insert_unordered(SCHEMAS[kind][0], docs)
+        inserted = [doc for i, doc in enumerate(docs) if i not in duplicates]
+        result['inserted'] += len(inserted)
+        result['duplicates'] += len(docs) - len(inserted)
+        # Rollups follow every chunk, so a failure later on leaves them matching what was
+        # inserted (a retry skips these rows as duplicates): one $inc per day in the chunk
+        totals = defaultdict(lambda: defaultdict(int))
+        _tally(totals, kind, inserted)
+        for day, deltas in totals.items():
+            rollups.totals_changed(user, day, deltas)
+
+    for number, row in enumerate(rows, 1):
+        try:
+            kind, doc = _parse(user.id, row, keep_ids)
+        except ValueError as e:
+            result['rejected'] += 1
+            if len(result['errors']) < MAX_ERRORS:
+                result['errors'].append(f'row {number}: {e}')
+            continue
+        pending[kind].append(doc)
+        if len(pending[kind]) >= chunk_size:
+            flush(kind)
+    for kind in SCHEMAS:
+        if pending[kind]:
+            flush(kind)
+    return result
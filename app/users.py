@@ -0,0 +1,47 @@
+from app.ml.cache import ResponseCache
+from app.models import User
+
+
+class UserCache:
+    """
+    Short-lived per-worker cache behind Flask-Login's user_loader.
+
+    Holds each user's raw document for `ttl` seconds so authenticated
+    requests don't each start with a Mongo round trip. Every request gets
+    its own User built from the cached document, never a shared instance.
+    Writes in this worker go through `update`, which invalidates the
+    entry; other workers see the change once their entry expires.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self.max_entries = 1024
+        self.cache = ResponseCache(self.max_entries, self.ttl)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('USER_CACHE_SIZE', self.max_entries)
+        self.cache = ResponseCache(self.max_entries, self.ttl)
+        app.extensions['user_cache'] = self
+
+    def load(self, user_id):
+        son = self.cache.get(str(user_id))
+        if son is not None:
+            return User._from_son(son)
+        user = User.objects(pk=user_id).first()
+        if user is not None:
+            self.cache.set(str(user_id), user.to_mongo().to_dict())
+        return user
+
+    def invalidate(self, user_id):
+        self.cache.delete(str(user_id))
+
+    def update(self, user, **fields):
+        """Writes only `fields` with $set, mirrors them on `user` and drops the cached copy."""
+        User.objects(pk=user.pk).update_one(**{f'set__{name}': value for name, value in fields.items()})
+        for name, value in fields.items():
+            setattr(user, name, value)
+        user._clear_changed_fields()
+        self.invalidate(user.pk)
@@ -0,0 +1,21 @@
+"""
+ASGI entry point for I/O-bound serving.
+
+The Flask app stays synchronous; each request runs on a large per-process
+thread pool while the event loop keeps accepting connections, so one
+worker can hold hundreds of requests that are waiting on Gemini or
+MongoDB instead of one per sync worker. Run with:
+
+    gunicorn -c gunicorn.asgi.conf.py asgi:application
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+# Let more model calls be in flight per process than the sync default
+os.environ.setdefault('GEMINI_MAX_CONCURRENT', '128')
+
+from app import create_app  # noqa: E402
+
+app = create_app()
+application = WSGIMiddleware(app, workers=int(os.environ.get('ASGI_THREADS', 256)))
@@ -0,0 +1,141 @@
+"""
+Sync (wsgi:app) versus ASGI (asgi:application) serving under concurrent AI load.
+
+Starts each mode as a single gunicorn worker on a local port with the fake
+Gemini backend (`--model-latency` seconds per call) and an in-memory
+mongomock database, registers a user, then fires `--requests` POST /chat
+calls from `--concurrency` client threads. Reports latency percentiles
+and throughput per mode; a single worker keeps the comparison about what
+one process can hold in flight.
+
+    pip install gunicorn uvicorn a2wsgi mongomock
+    python benchmarks/bench_asgi.py [--concurrency 100] [--requests 400] [--json]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODES = {
+    'sync': ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1', 'wsgi:app'],
+    'asgi': ['gunicorn', '-c', 'gunicorn.asgi.conf.py', '--workers', '1', 'asgi:application'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(mode, port, model_latency):
+    env = dict(os.environ,
+               MONGODB_URI='mongomock://localhost/titan_bench',
+               GEMINI_BACKEND='fake',
+               FAKE_MODEL_LATENCY=str(model_latency),
+               AI_CACHE_SIZE='0',
+               METRICS_LOG='0',
+               PYTHONWARNINGS='ignore')
+    cmd = MODES[mode] + ['--bind', f'127.0.0.1:{port}']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/login')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    stop(proc)
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def stop(proc):
+    os.killpg(proc.pid, signal.SIGTERM)
+    proc.wait(timeout=30)
+
+
+def session_cookie(port):
+    body = urllib.parse.urlencode({'username': 'bench', 'password': 'bench'})
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('POST', '/register', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    return response.getheader('Set-Cookie').split(';')[0]
+
+
+def drive(port, cookie, requests, concurrency):
+    body = json.dumps({'message': 'I had 2 idli for breakfast, how am I doing?'})
+    headers = {'Content-Type': 'application/json', 'Cookie': cookie}
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            conn.request('POST', '/chat', body, headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except OSError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    ms = np.array([r[0] for r in results]) * 1000
+    return {
+        'requests': requests,
+        'errors': sum(not r[1] for r in results),
+        'p50_ms': round(float(np.percentile(ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(ms, 95)), 1),
+        'p99_ms': round(float(np.percentile(ms, 99)), 1),
+        'throughput_rps': round(requests / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--model-latency', type=float, default=0.5,
+                        help='Seconds per fake Gemini call.')
+    parser.add_argument('--modes', nargs='*', default=list(MODES))
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    report = {'concurrency': args.concurrency, 'model_latency_s': args.model_latency, 'modes': {}}
+    for mode in args.modes:
+        port = free_port()
+        proc = start(mode, port, args.model_latency)
+        try:
+            cookie = session_cookie(port)
+            report['modes'][mode] = drive(port, cookie, args.requests, args.concurrency)
+        finally:
+            stop(proc)
+        if not args.json:
+            row = report['modes'][mode]
+            print(f"{mode:5} p50 {row['p50_ms']:8.1f}ms  p95 {row['p95_ms']:8.1f}ms  "
+                  f"p99 {row['p99_ms']:8.1f}ms  {row['throughput_rps']:7.1f} req/s  "
+                  f"{row['errors']} errors", flush=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Cold-start cost of a worker: importing the app package and create_app().
+
+Starts `--runs` fresh interpreters that each build the app (the same work
+a gunicorn worker does before serving) and reports the median of the boot
+timings create_app() logs, plus total process time.
+
+    python benchmarks/bench_boot.py [--runs 10] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SCRIPT = "from app import create_app; create_app({'MONGODB_URI': %r, 'METRICS_LOG': False})"
+
+
+def boot_once(mongo_uri):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', SCRIPT % mongo_uri], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    elapsed = time.perf_counter() - start
+    boot = next(json.loads(line) for line in out.splitlines() if line.startswith('{"event": "boot"'))
+    return boot['import_ms'], boot['create_app_ms'], elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/titan_bench',
+                        help='Never contacted: connections are opened on first query.')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    runs = [boot_once(args.mongo_uri) for _ in range(args.runs)]
+    report = {
+        'runs': args.runs,
+        'import_ms': round(statistics.median(r[0] for r in runs), 1),
+        'create_app_ms': round(statistics.median(r[1] for r in runs), 1),
+        'process_ms': round(statistics.median(r[2] for r in runs), 1),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"median of {args.runs}: import {report['import_ms']}ms, "
+              f"create_app {report['create_app_ms']}ms, whole process {report['process_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Parse success rate and throughput of model-response decoding.
+
+Runs every response in corpus/model_responses.jsonl through the old
+strip-fences-then-json.loads parser and through app.ml.decoding, and
+reports how many each gets right (decoded when the response is usable,
+rejected when it is not) and how many responses per second each handles.
+
+    python benchmarks/bench_decoding.py [--repeat 2000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ml.decoding import DecodeError, decode  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'corpus', 'model_responses.jsonl')
+
+
+def legacy_parse(text, kind):
+    # What FoodClassifier did before app.ml.decoding
+    return json.loads(text.strip().replace('```json', '').replace('```', ''))
+
+
+def new_parse(text, kind):
+    return decode(text, kind)
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(parse, corpus):
+    correct, failures = 0, []
+    for row in corpus:
+        try:
+            parse(row['text'], row['kind'])
+            ok = True
+        except (ValueError, DecodeError):
+            ok = False
+        if ok == row['decodable']:
+            correct += 1
+        else:
+            failures.append(row['note'])
+    usable = sum(row['decodable'] for row in corpus)
+    decoded = sum(row['decodable'] for row in corpus if row['note'] not in failures)
+    return {
+        'correct': correct,
+        'total': len(corpus),
+        'success_rate': round(decoded / usable, 3) if usable else None,
+        'wrong': failures,
+    }
+
+
+def throughput(parse, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in corpus:
+            try:
+                parse(row['text'], row['kind'])
+            except (ValueError, DecodeError):
+                pass
+    elapsed = time.perf_counter() - start
+    return round(repeat * len(corpus) / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=CORPUS)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    report = {}
+    for name, parse in (('legacy', legacy_parse), ('decoding', new_parse)):
+        report[name] = score(parse, corpus)
+        report[name]['per_second'] = throughput(parse, corpus, args.repeat)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{len(corpus)} responses, {args.repeat} passes")
+    for name, row in report.items():
+        print(f"{name:9} correct {row['correct']:>3}/{row['total']}  "
+              f"usable decoded {row['success_rate']:.0%}  {row['per_second']:>9,}/s")
+        for note in row['wrong']:
+            print(f"          wrong: {note}")
+
+
+if __name__ == '__main__':
+    main()
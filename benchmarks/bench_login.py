@@ -0,0 +1,112 @@
+"""
+Login throughput and latency at several password hash costs.
+
+For each werkzeug method in `--methods`, boots create_app() against
+mongomock with PASSWORD_HASH_METHOD set to it, seeds `--users` accounts
+and POSTs /login for each from `--concurrency` client threads, three times:
+'cold' logins pay the KDF; 'warm' ones repeat them within
+PASSWORD_CACHE_TTL and are answered by the verified-login cache; 'unknown'
+ones name no account and must cost about as much as 'cold'.
+`--max-concurrent` sets PASSWORD_MAX_CONCURRENT (default: one per core),
+so runs with different values show what bounding the KDFs costs or saves.
+
+    pip install mongomock
+    python benchmarks/bench_login.py [--users 200] [--concurrency 16] [--json]
+    python benchmarks/bench_login.py --methods pbkdf2:sha256:600000 --max-concurrent 1
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+METHODS = ['pbkdf2:sha256:100000', 'pbkdf2:sha256:600000', 'scrypt:16384:8:1', 'scrypt:32768:8:1']
+PASSWORD = 'correct horse battery staple'
+
+
+def run_logins(clients, concurrency, prefix='bench'):
+    latencies, failures = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal failures
+        start = time.perf_counter()
+        response = clients[i].post('/login', data={'username': f'{prefix}{i}', 'password': PASSWORD})
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if (response.status_code == 302) != (prefix == 'bench'):
+                failures += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(len(clients))))
+    wall = time.perf_counter() - wall_start
+
+    ms = np.array(latencies) * 1000
+    return {
+        'logins_per_s': round(len(clients) / wall, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'failures': failures,
+    }
+
+
+def bench_method(method, args):
+    from app import create_app, passwords
+    from app.models import User
+    config = {'MONGODB_URI': 'mongomock://localhost/titan_bench_login', 'METRICS_LOG': False,
+              'PASSWORD_HASH_METHOD': method}
+    if args.max_concurrent:
+        config['PASSWORD_MAX_CONCURRENT'] = args.max_concurrent
+    app = create_app(config)
+
+    User.objects.delete()
+    start = time.perf_counter()
+    stored = passwords.hash(PASSWORD)
+    hash_ms = (time.perf_counter() - start) * 1000
+    # One hash for everyone: the cache is keyed per user, so the first login of each still misses
+    User._get_collection().insert_many([{'username': f'bench{i}', 'password': stored}
+                                        for i in range(args.users)])
+    clients = [app.test_client() for _ in range(args.users)]
+
+    result = {'hash_ms': round(hash_ms, 1)}
+    for phase in ('cold', 'warm'):
+        result[phase] = run_logins(clients, args.concurrency)
+    result['unknown'] = run_logins(clients, args.concurrency, prefix='nobody')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--methods', nargs='+', default=METHODS)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--max-concurrent', type=int, default=None,
+                        help='PASSWORD_MAX_CONCURRENT (default: cores).')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    report = {'users': args.users, 'concurrency': args.concurrency,
+              'max_concurrent': args.max_concurrent or os.cpu_count(), 'methods': {}}
+    for method in args.methods:
+        row = report['methods'][method] = bench_method(method, args)
+        if not args.json:
+            for phase in ('cold', 'warm', 'unknown'):
+                r = row[phase]
+                print(f"{method:22} {phase:7}  {r['logins_per_s']:8.1f} logins/s  "
+                      f"p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                      f"{r['failures']} failures", flush=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Lookup latency of the local nutrition index on a large synthetic catalog.
+
+Builds a NutritionIndex over `--dishes` generated dish names (a few very
+common words such as "chicken" and "rice" mixed with rare ones), then
+times match_item on exact names, common-word queries and misspellings.
+Reports build time and mean / p95 / worst lookup latency, plus how many
+exact names resolve to their own dish.
+
+    python benchmarks/bench_nutrition.py [--dishes 100000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ml.nutrition import NutritionIndex  # noqa: E402
+
+COMMON = ['chicken', 'rice', 'paneer', 'masala', 'curry', 'fried', 'soup', 'salad', 'roti',
+          'dal', 'egg', 'fish', 'aloo', 'spicy', 'sweet', 'grilled', 'butter', 'tikka',
+          'noodle', 'cake']
+
+
+def catalog(dishes, rng):
+    rare = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+            for _ in range(max(dishes // 3, 10))]
+    data = {}
+    while len(data) < dishes:
+        words = rng.sample(COMMON, rng.randint(1, 2)) + rng.sample(rare, rng.randint(0, 2))
+        rng.shuffle(words)
+        data[' '.join(words)] = {'calories': '250', 'protein': '10g', 'carbs': '30g',
+                                 'fat': '8g', 'unit': '1 plate (250g)'}
+    return data
+
+
+def timings(index, queries):
+    ms = []
+    for query in queries:
+        start = time.perf_counter()
+        index.match_item(query)
+        ms.append((time.perf_counter() - start) * 1000)
+    ms = np.array(ms)
+    return {'mean_ms': round(float(ms.mean()), 3), 'p95_ms': round(float(np.percentile(ms, 95)), 3),
+            'max_ms': round(float(ms.max()), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dishes', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    data = catalog(args.dishes, rng)
+    start = time.perf_counter()
+    index = NutritionIndex(data)
+    build = time.perf_counter() - start
+
+    names = rng.sample(list(data), args.queries)
+    groups = {
+        'exact': names,
+        'common': [' '.join(rng.sample(COMMON, rng.randint(1, 3))) for _ in range(args.queries)],
+        'misspelled': [n.replace('a', 'e', 1).replace('i', 'y', 1) for n in names],
+    }
+    report = {'dishes': args.dishes, 'build_s': round(build, 2),
+              'exact_recall': sum(index.names[m[0]] == n for n in names
+                                  if (m := index.match_item(n))) / len(names),
+              'lookups': {group: timings(index, queries) for group, queries in groups.items()}}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.dishes:,} dishes, index built in {report['build_s']}s, "
+          f"exact-name recall {report['exact_recall']:.1%}")
+    for group, row in report['lookups'].items():
+        print(f"{group:11} mean {row['mean_ms']:7.3f}ms  p95 {row['p95_ms']:7.3f}ms  "
+              f"max {row['max_ms']:7.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Fault-injection checks and per-call overhead of ModelGuard.
+
+Drives app.ml.resilience against the offline FakeGenerativeModel with
+injected failures, slow calls and saturated slots, and checks that the
+circuit breaker opens, probes and recovers, that a refused slot never
+leaves a half-open trial claimed, and that streamed calls hold their slot
+and deadline until the last chunk. Then times guarded against direct
+calls. Exits 1 if any check fails.
+
+    python benchmarks/bench_resilience.py [--calls 20000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.ml.fake import FakeGenerativeModel  # noqa: E402
+from app.ml.resilience import CircuitBreaker, CircuitOpen, ModelBusy, ModelGuard  # noqa: E402
+
+PROMPT = "Fitness Coach. Then write a line containing only <<ACTION>> followed by JSON"
+
+
+def guard(**kwargs):
+    breaker = CircuitBreaker(failure_threshold=kwargs.pop('threshold', 2),
+                             reset_timeout=kwargs.pop('reset', 0.05))
+    return ModelGuard(retries=0, backoff=0.001, acquire_timeout=kwargs.pop('acquire', 0.05),
+                      breaker=breaker, **kwargs)
+
+
+def raises(error, fn, *args, **kwargs):
+    try:
+        fn(*args, **kwargs)
+    except error:
+        return True
+    return False
+
+
+def fail_until_open(g):
+    failing = FakeGenerativeModel(failure_rate=1.0)
+    while g.breaker.state == 'closed':
+        raises(ConnectionError, g.call, failing.generate_content, PROMPT)
+
+
+def check_opens_and_fails_fast():
+    g, model = guard(), FakeGenerativeModel(failure_rate=1.0)
+    for _ in range(2):
+        raises(ConnectionError, g.call, model.generate_content, PROMPT)
+    calls = model.calls
+    refused = raises(CircuitOpen, g.call, model.generate_content, PROMPT)
+    return g.breaker.state == 'open' and refused and model.calls == calls
+
+
+def check_half_open_recovers():
+    g, model = guard(), FakeGenerativeModel()
+    fail_until_open(g)
+    time.sleep(0.06)
+    g.call(model.generate_content, PROMPT)
+    return g.breaker.state == 'closed'
+
+
+def check_busy_trial_is_released():
+    # A half-open call refused for lack of a slot must not keep the trial claimed
+    g, model = guard(max_concurrent=1), FakeGenerativeModel()
+    fail_until_open(g)
+    time.sleep(0.06)
+    g._slots.acquire()
+    busy = raises(ModelBusy, g.call, model.generate_content, PROMPT)
+    g._slots.release()
+    g.call(model.generate_content, PROMPT)
+    return busy and g.breaker.state == 'closed'
+
+
+def check_stream_holds_slot():
+    g, model = guard(max_concurrent=1), FakeGenerativeModel()
+    chunks = g.stream(model.generate_content, PROMPT, stream=True)
+    next(chunks)
+    busy = raises(ModelBusy, g.call, model.generate_content, PROMPT)
+    list(chunks)
+    g.call(model.generate_content, PROMPT)
+    return busy
+
+
+def check_stream_faults_count():
+    g, model = guard(), FakeGenerativeModel(stream_fault_after=2)
+    for _ in range(2):
+        raises(ConnectionError, list, g.stream(model.generate_content, PROMPT, stream=True))
+    return g.breaker.state == 'open'
+
+
+def check_stream_deadline():
+    g, model = guard(timeout=0.05), FakeGenerativeModel(latency=0.5)
+    return raises(TimeoutError, list, g.stream(model.generate_content, PROMPT, stream=True))
+
+
+def check_closed_stream_releases_trial():
+    g, model = guard(), FakeGenerativeModel()
+    fail_until_open(g)
+    time.sleep(0.06)
+    chunks = g.stream(model.generate_content, PROMPT, stream=True)
+    next(chunks)
+    chunks.close()
+    g.call(model.generate_content, PROMPT)
+    return g.breaker.state == 'closed'
+
+
+def check_concurrency_cap():
+    g, model = guard(max_concurrent=4, acquire=5.0), FakeGenerativeModel(latency=0.02)
+    peak, running, lock = 0, 0, threading.Lock()
+
+    def tracked(*args, **kwargs):
+        nonlocal peak, running
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        try:
+            return model.generate_content(*args, **kwargs)
+        finally:
+            with lock:
+                running -= 1
+    threads = [threading.Thread(target=g.call, args=(tracked, PROMPT)) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return peak == 4
+
+
+CHECKS = [check_opens_and_fails_fast, check_half_open_recovers, check_busy_trial_is_released,
+          check_stream_holds_slot, check_stream_faults_count, check_stream_deadline,
+          check_closed_stream_releases_trial, check_concurrency_cap]
+
+
+def run(check):
+    try:
+        return bool(check())
+    except Exception as e:
+        print(f"{check.__name__}: {e!r}", file=sys.stderr)
+        return False
+
+
+def overhead(calls):
+    model, g = FakeGenerativeModel(), ModelGuard()
+    start = time.perf_counter()
+    for _ in range(calls):
+        model.generate_content(PROMPT)
+    direct = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(calls):
+        g.call(model.generate_content, PROMPT)
+    guarded = time.perf_counter() - start
+    return round((guarded - direct) / calls * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20_000)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    report = {'checks': {check.__name__[len('check_'):]: run(check) for check in CHECKS},
+              'overhead_us_per_call': overhead(args.calls)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, ok in report['checks'].items():
+            print(f"{'ok' if ok else 'FAIL':5} {name}")
+        print(f"guard overhead: {report['overhead_us_per_call']} us/call")
+    if not all(report['checks'].values()):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Latency, throughput and DB query counts for the main routes.
+
+Boots create_app() against mongomock (default) or a real mongod, seeds a
+user population with `--days` of food, water and exercise history, and
+drives `/`, `/stats`, `/add_water`, `/chat`, `/predict` and `/advisor`
+through Flask test clients, one per virtual user. Gemini is replaced by
+the built-in fake backend with `--model-latency` seconds per call, and the
+response cache is off unless `--ai-cache` is given, so every model route
+pays that latency.
+
+Reports p50/p95/p99 and mean latency, requests per second and MongoDB
+queries per request for each route, and writes them as JSON (default
+benchmarks/results/routes-<timestamp>.json) for comparing runs.
+
+    pip install mongomock
+    python benchmarks/bench_routes.py [--users 20] [--requests 200] [--concurrency 4]
+    python benchmarks/bench_routes.py --mongo-uri mongodb://localhost/titan_bench
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+ROUTES = ['/', '/stats', '/add_water', '/chat', '/advisor', '/predict']
+
+COLLECTION_METHODS = [
+    'find', 'find_one', 'insert_one', 'insert_many', 'update_one', 'update_many',
+    'replace_one', 'delete_one', 'delete_many', 'find_one_and_update',
+    'find_one_and_delete', 'find_one_and_replace', 'aggregate', 'count_documents',
+    'distinct', 'bulk_write',
+]
+
+
+class QueryCounter:
+    """Counts MongoDB operations: command events on a real server, collection calls on mongomock."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.count += 1
+
+    def take(self):
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+    def install_listener(self):
+        from pymongo import monitoring
+        counter = self
+
+        class Listener(monitoring.CommandListener):
+            def started(self, event):
+                if event.command_name not in ('hello', 'isMaster', 'ismaster', 'ping', 'endSessions'):
+                    counter.hit()
+
+            def succeeded(self, event):
+                pass
+
+            def failed(self, event):
+                pass
+
+        monitoring.register(Listener())
+
+    def patch_mongomock(self):
+        from mongomock.collection import Collection
+        counter = self
+        for name in COLLECTION_METHODS:
+            original = getattr(Collection, name)
+
+            def counted(self, *args, _original=original, **kwargs):
+                counter.hit()
+                return _original(self, *args, **kwargs)
+            setattr(Collection, name, counted)
+
+
+def seed(users, days, rng):
+    """Inserts users with `days` of history each, plus matching DailyRollup documents."""
+    from app.models import User, FoodLog, WaterLog, ExerciseLog, DailyRollup
+    from app.rollups import day_of
+
+    user_docs = [{'username': f'bench{i}', 'password': 'bench', 'height': 175.0, 'weight': 70.0,
+                  'age': 30, 'gender': 'Male', 'activity_level': 'Moderate',
+                  'goal_calories': 2200, 'goal_protein': 150, 'goal_water': 8}
+                 for i in range(users)]
+    user_ids = User._get_collection().insert_many(user_docs).inserted_ids
+
+    foods, waters, exercises, rollups = [], [], [], []
+    today = date.today()
+    for user_id in user_ids:
+        for back in range(days):
+            day = day_of(today - timedelta(days=back))
+            n_food, n_water = int(rng.integers(3, 7)), int(rng.integers(4, 10))
+            calories = rng.integers(80, 700, n_food)
+            protein = np.round(rng.uniform(1, 35, n_food), 1)
+            burned = int(rng.integers(100, 600))
+            for i in range(n_food):
+                foods.append({'user': user_id, 'name': f'Food {i}', 'calories': int(calories[i]),
+                              'protein': float(protein[i]), 'carbs': 20.0, 'fat': 8.0,
+                              'date_posted': day + timedelta(hours=8 + i * 2)})
+            for i in range(n_water):
+                waters.append({'user': user_id, 'amount': 1, 'date_posted': day + timedelta(hours=7 + i)})
+            exercises.append({'user': user_id, 'activity_name': 'Running', 'duration_minutes': 30,
+                              'calories_burned': burned, 'date_posted': day + timedelta(hours=18)})
+            rollups.append({'user': user_id, 'day': day, 'calories_in': int(calories.sum()),
+                            'calories_out': burned, 'protein': float(protein.sum()),
+                            'carbs': 20.0 * n_food, 'fat': 8.0 * n_food, 'water': n_water,
+                            'food_count': n_food, 'exercise_count': 1})
+    for document, rows in ((FoodLog, foods), (WaterLog, waters), (ExerciseLog, exercises),
+                           (DailyRollup, rollups)):
+        document._get_collection().insert_many(rows)
+    return {'users': users, 'food_logs': len(foods), 'water_logs': len(waters),
+            'exercise_logs': len(exercises), 'rollups': len(rollups)}
+
+
+def make_images(count, rng):
+    """Distinct phone-sized JPEGs, so uploads neither dedupe nor hit the response cache."""
+    from PIL import Image
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 255, (3,), dtype=np.uint8)
+        noise = rng.integers(0, 40, (1200, 1600, 3), dtype=np.uint8)
+        out = io.BytesIO()
+        Image.fromarray(noise + base).save(out, 'JPEG', quality=90)
+        images.append(out.getvalue())
+    return images
+
+
+def request_for(route, client, images, n):
+    """Sends one request to `route`; returns the response."""
+    if route == '/chat':
+        return client.post('/chat', json={'message': 'I had 2 idli for breakfast, how am I doing?'})
+    if route == '/predict':
+        return client.post('/predict', headers={'Accept': 'application/json'},
+                           data={'file': (io.BytesIO(images[n % len(images)]), 'meal.jpg')})
+    return client.get(route)
+
+
+def prepare(route, client):
+    """Untimed setup before a request, e.g. an estimate waiting on /advisor."""
+    if route == '/advisor':
+        client.post('/manual_add', data={'food_text': '2 Idli'})
+
+
+def run_route(route, clients, images, requests, concurrency, counter, jobs):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(n):
+        nonlocal errors
+        client = clients[n % len(clients)]
+        prepare(route, client)
+        start = time.perf_counter()
+        response = request_for(route, client, images, n)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    # Queries made by the untimed prepare() step, subtracted from the route's count
+    counter.take()
+    for client in clients:
+        prepare(route, client)
+    setup_queries = counter.take() / len(clients)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    if route == '/predict':
+        # Background analysis is part of the route's cost
+        jobs.shutdown(wait=True)
+    wall = time.perf_counter() - wall_start
+    queries = counter.take() - setup_queries * requests
+
+    ms = np.array(latencies) * 1000
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'mean_ms': round(float(ms.mean()), 2),
+        'throughput_rps': round(requests / wall, 1),
+        'queries_per_request': round(queries / requests, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mongo-uri', default='mongomock://localhost/titan_bench')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--days', type=int, default=90, help='Days of history per user.')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route.')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--model-latency', type=float, default=0.05,
+                        help='Seconds per fake Gemini call.')
+    parser.add_argument('--ai-cache', action='store_true', help='Keep the Gemini response cache on.')
+    parser.add_argument('--routes', nargs='*', default=ROUTES)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='JSON report path.')
+    args = parser.parse_args()
+
+    counter = QueryCounter()
+    if args.mongo_uri.startswith('mongomock://'):
+        counter.patch_mongomock()
+    else:
+        counter.install_listener()
+
+    from app import create_app, jobs
+    app = create_app({
+        'MONGODB_URI': args.mongo_uri,
+        'GEMINI_BACKEND': 'fake',
+        'FAKE_MODEL_LATENCY': args.model_latency,
+        'AI_CACHE_SIZE': 1024 if args.ai_cache else 0,
+        'AI_CACHE_STORE': None,
+        'UPLOAD_FOLDER': tempfile.mkdtemp(prefix='titan-bench-'),
+        'JOB_QUEUE_SIZE': args.requests + 1,
+        'METRICS_LOG': False,
+    })
+
+    rng = np.random.default_rng(args.seed)
+    print("Seeding...", flush=True)
+    data = seed(args.users, args.days, rng)
+    images = make_images(min(args.requests, 16), rng) if '/predict' in args.routes else []
+
+    clients = []
+    for i in range(args.users):
+        client = app.test_client()
+        client.post('/login', data={'username': f'bench{i}', 'password': 'bench'})
+        clients.append(client)
+
+    results = {}
+    for route in args.routes:
+        results[route] = run_route(route, clients, images, args.requests, args.concurrency,
+                                   counter, jobs)
+        row = results[route]
+        print(f"{route:11} p50 {row['p50_ms']:8.2f}ms  p95 {row['p95_ms']:8.2f}ms  "
+              f"p99 {row['p99_ms']:8.2f}ms  {row['throughput_rps']:8.1f} req/s  "
+              f"{row['queries_per_request']:5.2f} q/req  {row['errors']} errors", flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'backend': 'mongomock' if args.mongo_uri.startswith('mongomock://') else 'mongod',
+            'users': args.users,
+            'days': args.days,
+            'requests_per_route': args.requests,
+            'concurrency': args.concurrency,
+            'model_latency_s': args.model_latency,
+            'ai_cache': args.ai_cache,
+            'data': data,
+        },
+        'routes': results,
+    }
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results',
+                                   f"routes-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == '__main__':
+    main()
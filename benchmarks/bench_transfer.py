@@ -0,0 +1,149 @@
+"""
+Rows per second for bulk log import and export (app/transfer.py).
+
+Writes a synthetic gzipped NDJSON history of `--rows` logs (food, water
+and exercise spread over `--days`) without holding it in memory, imports
+it for one user, imports it again (every row a duplicate), then exports
+it as gzipped NDJSON and CSV. With `--memory`, tracemalloc reports the
+peak Python allocation of each phase; export and re-import stay flat,
+while a first import against mongomock also counts the in-memory
+database growing.
+
+    pip install mongomock
+    python benchmarks/bench_transfer.py [--rows 200000] [--chunk-size 1000] [--json]
+    python benchmarks/bench_transfer.py --mongo-uri mongodb://localhost/titan_bench --rows 2000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def synthetic_rows(rows, days, rng):
+    """Yields export-format rows, generated in blocks of 10k."""
+    start = datetime.now() - timedelta(days=days)
+    kinds = np.array(['food', 'water', 'exercise'])
+    for offset in range(0, rows, 10_000):
+        n = min(10_000, rows - offset)
+        kind = kinds[rng.choice(3, n, p=[0.6, 0.3, 0.1])]
+        seconds = np.sort(rng.integers(0, days * 86400, n))
+        calories = rng.integers(50, 800, n)
+        minutes = rng.integers(10, 90, n)
+        for i in range(n):
+            row = {'type': str(kind[i]),
+                   'date_posted': (start + timedelta(seconds=int(seconds[i]))).isoformat()}
+            if kind[i] == 'food':
+                row.update(name=f'Food {i % 500}', calories=int(calories[i]),
+                           protein=round(float(calories[i]) / 25, 1), carbs=30.0, fat=10.0)
+            elif kind[i] == 'exercise':
+                row.update(activity_name='Running', duration_minutes=int(minutes[i]),
+                           calories_burned=int(minutes[i]) * 10, met=8.0)
+            yield row
+
+
+def timed(fn, memory):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = fn()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return value, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mongo-uri', default='mongomock://localhost/titan_bench')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=365 * 3)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--memory', action='store_true', help='Report peak allocations (slower).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    from app import create_app, transfer
+    from app.models import User
+    create_app({'MONGODB_URI': args.mongo_uri, 'METRICS_LOG': False})
+    User.objects(username='bench-transfer').delete()
+    user = User(username='bench-transfer', password='bench').save()
+
+    workdir = tempfile.mkdtemp(prefix='titan-transfer-')
+    source = os.path.join(workdir, 'source.ndjson.gz')
+    rng = np.random.default_rng(args.seed)
+
+    def write_source():
+        with open(source, 'wb') as out:
+            for data in transfer.gzip_chunks(transfer.encode(synthetic_rows(args.rows, args.days, rng))):
+                out.write(data)
+
+    def import_source():
+        with open(source, 'rb') as f:
+            return transfer.import_rows(user, transfer.read_rows(transfer.open_text(f)),
+                                        chunk_size=args.chunk_size, keep_ids=False)
+
+    def reimport_export(path):
+        def run():
+            with open(path, 'rb') as f:
+                return transfer.import_rows(user, transfer.read_rows(transfer.open_text(f),
+                                                                     transfer.format_for(path)),
+                                            chunk_size=args.chunk_size)
+        return run
+
+    def export(fmt):
+        path = os.path.join(workdir, f'export.{fmt}.gz')
+
+        def run():
+            with open(path, 'wb') as out:
+                for data in transfer.gzip_chunks(transfer.encode(transfer.iter_rows(user), fmt)):
+                    out.write(data)
+            return path
+        return run
+
+    report = {'rows': args.rows, 'chunk_size': args.chunk_size,
+              'backend': 'mongomock' if args.mongo_uri.startswith('mongomock://') else 'mongod',
+              'phases': {}}
+
+    def record(name, seconds, peak, **extra):
+        row = {'seconds': round(seconds, 2), 'rows_per_s': round(args.rows / seconds)}
+        if peak is not None:
+            row['peak_mb'] = round(peak / 2**20, 1)
+        row.update(extra)
+        report['phases'][name] = row
+        if not args.json:
+            mem = f"  peak {row['peak_mb']:7.1f} MB" if peak is not None else ''
+            more = ''.join(f'  {k} {v}' for k, v in extra.items())
+            print(f"{name:18} {row['seconds']:8.2f}s  {row['rows_per_s']:9,} rows/s{mem}{more}", flush=True)
+
+    _, seconds, peak = timed(write_source, args.memory)
+    record('generate', seconds, peak, file_mb=round(os.path.getsize(source) / 2**20, 1))
+
+    result, seconds, peak = timed(import_source, args.memory)
+    record('import', seconds, peak, inserted=result['inserted'], rejected=result['rejected'])
+
+    for fmt in transfer.FORMATS:
+        path, seconds, peak = timed(export(fmt), args.memory)
+        record(f'export {fmt}.gz', seconds, peak, file_mb=round(os.path.getsize(path) / 2**20, 1))
+
+    result, seconds, peak = timed(reimport_export(os.path.join(workdir, 'export.ndjson.gz')),
+                                  args.memory)
+    record('reimport (dupes)', seconds, peak, duplicates=result['duplicates'])
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+# Gunicorn configuration for the ASGI entry point (asgi:application).
+# Workers and bind come from WEB_CONCURRENCY / PORT as for the sync config.
+
+worker_class = 'uvicorn.workers.UvicornWorker'
+# Requests wait on Gemini for seconds; don't recycle workers under them
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+
+def post_worker_init(worker):
+    # Same as gunicorn.conf.py: build the Gemini client inside each worker
+    from app import classifiers
+    try:
+        classifiers.warm_up()
+    except Exception as e:
+        worker.log.warning(f"Classifier warm-up failed: {e}")
@@ -0,0 +1,11 @@
+# Gunicorn configuration (used by the Procfile).
+
+
+def post_worker_init(worker):
+    # Build the Gemini client inside each worker once the app is loaded
+    # (and configured), so the first real request doesn't pay for it.
+    from app import classifiers
+    try:
+        classifiers.warm_up()
+    except Exception as e:
+        worker.log.warning(f"Classifier warm-up failed: {e}")